@@ -0,0 +1,258 @@
+"""Audio
+
+This module contains the sound bank that plays the sound effects,
+and the music player that streams the music tracks from memory.
+"""
+
+
+import io
+import logging
+import os
+import struct
+import threading
+import time
+
+import pygame
+
+from . import runtime
+
+
+logger = logging.getLogger(__name__)
+
+
+# sound effects read up front and the channels reserved for them
+SOUND_EFFECTS = ('task-done', 'ready-set-go')
+SFX_CHANNELS = 4
+
+
+class SoundBank:
+    """Decodes each sound effect once and plays them through a reserved channel pool.
+
+    When every channel in the pool is busy, the sound that started
+    playing first is cut off to make room for the new one.
+
+    The sound files can be read into memory on a worker thread, but the
+    sounds are only decoded into mixer Sound objects on the main thread,
+    since the mixer is not safe to use from other threads.
+
+    Attributes:
+        channel_count (int): Number of mixer channels reserved for sound effects.
+        channels (list): The reserved channels, created on first play.
+        started (list): Time each channel last started playing.
+        files (dict): Contents of the sound files read ahead, keyed by file path.
+        sounds (dict): Decoded sounds keyed by file path.
+        stats (dict): Decode time in seconds and size in bytes of each sound.
+        lock (obj): Guards the files read ahead.
+    """
+
+    def __init__(self, channel_count=SFX_CHANNELS):
+        self.channel_count = channel_count
+        self.channels = []
+        self.started = []
+        self.files = {}
+        self.sounds = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def read(self, path):
+        """Reads a sound file into memory, without decoding it.
+
+        Args:
+            path (str): Path to the sound file.
+
+        Returns:
+            data (bytes): The contents of the file.
+        """
+        with self.lock:
+            data = self.files.get(path)
+        if data is None:
+            runtime.count_load()
+            with open(path, 'rb') as sound_file:
+                data = sound_file.read()
+            with self.lock:
+                self.files[path] = data
+        return data
+
+    def load(self, path):
+        """Gets a decoded sound, decoding it on first use. Must be called on the main thread.
+
+        Args:
+            path (str): Path to the sound file.
+
+        Returns:
+            snd (obj): The decoded sound.
+        """
+        snd = self.sounds.get(path)
+        if snd is None:
+            data = self.read(path)
+            runtime.init_module('mixer')
+            runtime.count_load()
+            start = time.perf_counter()
+            snd = pygame.mixer.Sound(file=io.BytesIO(data))
+            decode_time = time.perf_counter() - start
+            frequency, size, channels = pygame.mixer.get_init()
+            sound_bytes = int(snd.get_length() * frequency) * channels * abs(size) // 8
+            self.sounds[path] = snd
+            self.stats[path] = {'decode_time': decode_time, 'bytes': sound_bytes}
+        return snd
+
+    def report(self):
+        """Logs the decode time and size of each decoded sound, and their totals."""
+        for path, stats in sorted(self.stats.items()):
+            logger.info('Sound %-20s decoded in %6.1fms  %7.0fKB', os.path.basename(path),
+                        stats['decode_time'] * 1000, stats['bytes'] / 1024)
+        if self.stats:
+            logger.info('Sounds decoded in %.1fms, %.0fKB in total',
+                        sum(stats['decode_time'] for stats in self.stats.values()) * 1000,
+                        sum(stats['bytes'] for stats in self.stats.values()) / 1024)
+
+    def get_channel(self):
+        """Gets a free reserved channel, or steals the one that started playing first.
+
+        Returns:
+            index (int): Index of the channel in the pool.
+        """
+        if not self.channels:
+            pygame.mixer.set_reserved(self.channel_count)
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+            self.started = [0.0] * self.channel_count
+        for index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return index
+        return self.started.index(min(self.started))
+
+    def play(self, path):
+        """Plays a sound once on a reserved channel.
+
+        Args:
+            path (str): Path to the sound file.
+        """
+        snd = self.load(path)
+        index = self.get_channel()
+        self.channels[index].play(snd)
+        self.started[index] = time.perf_counter()
+
+
+class MusicPlayer:
+    """Streams music tracks from memory and switches between them without restarting.
+
+    Tracks are read into memory on a worker thread ahead of time, so
+    switching to a prepared track does no file I/O. A switch starts the new
+    track at the same fraction of its length as the current track, which
+    keeps the tempo variants of a song in step.
+
+    Attributes:
+        prepared (dict): Track data and length in seconds keyed by file path.
+        track (str): Path of the track that is playing.
+        start (float): Position in seconds the current track was started at.
+        switch_times (list): Seconds taken by each switch.
+        lock (obj): Guards the prepared tracks.
+    """
+
+    def __init__(self):
+        self.prepared = {}
+        self.track = None
+        self.start = 0.0
+        self.switch_times = []
+        self.lock = threading.Lock()
+
+    def read(self, path):
+        """Reads a track into memory.
+
+        Args:
+            path (str): Path to the track file.
+
+        Returns:
+            track (tup): The track data and its length in seconds.
+        """
+        with self.lock:
+            track = self.prepared.get(path)
+        if track is None:
+            runtime.count_load()
+            with open(path, 'rb') as track_file:
+                data = track_file.read()
+            track = (data, ogg_length(data))
+            with self.lock:
+                self.prepared[path] = track
+        return track
+
+    def prepare(self, path):
+        """Reads a track into memory on a worker thread.
+
+        Args:
+            path (str): Path to the track file.
+        """
+        if path not in self.prepared:
+            threading.Thread(target=self.read, args=(path,), name='music-prepare', daemon=True).start()
+
+    def position(self):
+        """Returns the position in seconds of the current track, or 0 if nothing is playing."""
+        if self.track is None:
+            return 0.0
+        elapsed = pygame.mixer.music.get_pos()
+        if elapsed < 0:
+            return 0.0
+        position = self.start + elapsed / 1000
+        length = self.read(self.track)[1]
+        if length:
+            position %= length
+        return position
+
+    def play(self, path, start=0.0):
+        """Plays a track on infinite loop.
+
+        Args:
+            path (str): Path to the track file.
+            start (float): Position in seconds to start the track at.
+        """
+        data = self.read(path)[0]
+        runtime.init_module('mixer')
+        pygame.mixer.music.load(io.BytesIO(data))
+        pygame.mixer.music.play(-1, start)
+        self.track = path
+        self.start = start
+
+    def stop(self):
+        """Stops the music."""
+        if pygame.mixer.get_init():
+            pygame.mixer.music.stop()
+        self.track = None
+        self.start = 0.0
+
+    def switch(self, path):
+        """Switches to another track at the matching position.
+
+        Args:
+            path (str): Path to the track file.
+        """
+        switch_start = time.perf_counter()
+        start = 0.0
+        if self.track is not None:
+            length = self.read(self.track)[1]
+            new_length = self.read(path)[1]
+            if length and new_length:
+                start = self.position() / length * new_length
+        self.play(path, start)
+        switch_time = time.perf_counter() - switch_start
+        self.switch_times.append(switch_time)
+        logger.info('Switched music to %s in %.1fms', os.path.basename(path), switch_time * 1000)
+
+
+def ogg_length(data):
+    """Reads the length of an Ogg Vorbis track from its headers.
+
+    Args:
+        data (bytes): The contents of the track file.
+
+    Returns:
+        length (float): Length of the track in seconds, or 0 if it can't be read.
+    """
+    header = data.find(b'\x01vorbis')
+    last_page = data.rfind(b'OggS')
+    if header < 0 or last_page < 0:
+        return 0.0
+    rate = struct.unpack_from('<I', data, header + 12)[0]
+    samples = struct.unpack_from('<q', data, last_page + 6)[0]
+    if rate <= 0 or samples <= 0:
+        return 0.0
+    return samples / rate
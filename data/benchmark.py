@@ -0,0 +1,282 @@
+"""Benchmark
+
+This module drives each game state headless for a number of frames
+and measures the hot path of a frame, which is State.update plus the
+display update. Task states are fed a synthetic stream of their keys.
+The loading state is skipped, since its frames only wait on the asset
+loader thread, which logs the time of each asset tier instead.
+
+Results are written to JSON and compared against the baseline stored
+in benchmark-baseline.json. A state whose p95 frame time grows by more
+than the threshold counts as a regression, and the run exits with
+status 1. A missing baseline exits with status 2.
+
+Usage:
+    python -m data.benchmark [--frames N] [--output PATH] [--baseline PATH] [--threshold F] [--save-baseline]
+"""
+
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+from . import loader
+from . import state_machine
+from . import states
+from . import tasks
+from . import tools
+from .main import setup
+
+
+logger = logging.getLogger(__name__)
+
+
+BASELINE_PATH = 'benchmark-baseline.json'
+OUTPUT_PATH = 'benchmark-results.json'
+THRESHOLD = 0.2
+# p95 growth in milliseconds that is always treated as timer noise, for states that take microseconds
+NOISE_FLOOR = 0.05
+
+
+def synthetic_events(state):
+    """Returns an endless stream of input for a state, one event list per frame.
+
+    Task states get a KEYDOWN and a KEYUP of each of their keys in turn,
+    which finishes every task pattern. Other states get no input.
+
+    Args:
+        state (obj): The state to drive.
+
+    Returns:
+        events (iter): Lists of events, one for each frame.
+    """
+    task = getattr(state, 'task', None)
+    if task is None:
+        return itertools.repeat([])
+    keys = sorted(tasks.task_keys(task))
+    cycle = [[pygame.event.Event(event_type, key=key, mod=0)]
+             for key in keys for event_type in (pygame.KEYDOWN, pygame.KEYUP)]
+    return itertools.cycle(cycle)
+
+
+def start_state(game, name):
+    """Makes a state the current state of the controller without flipping.
+
+    The score, music and random number generator are reset first, so every
+    run of a state starts from the same game state, whichever states ran before.
+
+    Args:
+        game (obj): The state controller.
+        name (str): Name of the state.
+
+    Returns:
+        state (obj): The state, started up.
+    """
+    state_machine.State.score = 0
+    tools.music.stop()
+    game.rng.seed(game.seed)
+    game.state_name = name
+    game.state = game.get_state(name)
+    game.state.done = False
+    game.state.quit = False
+    game.state.invalidate()
+    game.state.startup()
+    return game.state
+
+
+def run_frames(game, name, frames):
+    """Runs a state for a number of frames and times each one.
+
+    The state is started again whenever it finishes, so tasks are repeated
+    and timed states such as start and taskdone keep running.
+
+    Args:
+        game (obj): The state controller.
+        name (str): Name of the state.
+        frames (int): Number of frames to run.
+
+    Returns:
+        times (list): Milliseconds of each frame.
+        blocks (list): Net memory blocks allocated by each frame.
+    """
+    state = start_state(game, name)
+    events = synthetic_events(state)
+    times = []
+    blocks = []
+    for frame in range(frames):
+        if state.done or state.quit:
+            state = start_state(game, name)
+        dt = game.clock.tick(0) / 1000.0
+        frame_events = next(events)
+        start_blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        for event in frame_events:
+            state.get_event(event)
+        dirty_rects = state.update(game.screen, dt)
+        if dirty_rects is None:
+            pygame.display.update()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+        times.append((time.perf_counter() - start) * 1000.0)
+        blocks.append(sys.getallocatedblocks() - start_blocks)
+    return times, blocks
+
+
+def peak_bytes(game, name, frames):
+    """Runs a state under tracemalloc and measures the peak memory allocated within each frame.
+
+    Tracing slows the frames down, so this runs separately from the timing.
+    Requires Python 3.9 for tracemalloc.reset_peak.
+
+    Args:
+        game (obj): The state controller.
+        name (str): Name of the state.
+        frames (int): Number of frames to run.
+
+    Returns:
+        peaks (list): Peak bytes allocated during each frame, or an empty list if unsupported.
+    """
+    if not hasattr(tracemalloc, 'reset_peak'):
+        return []
+    state = start_state(game, name)
+    events = synthetic_events(state)
+    peaks = []
+    tracemalloc.start()
+    try:
+        for frame in range(frames):
+            if state.done or state.quit:
+                state = start_state(game, name)
+            dt = game.clock.tick(0) / 1000.0
+            frame_events = next(events)
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            for event in frame_events:
+                state.get_event(event)
+            dirty_rects = state.update(game.screen, dt)
+            if dirty_rects is None:
+                pygame.display.update()
+            elif dirty_rects:
+                pygame.display.update(dirty_rects)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def benchmark(frames=600, names=None):
+    """Benchmarks each game state.
+
+    Assets are loaded on the calling thread before any state runs,
+    and the session runs headless on a fixed step clock.
+
+    Args:
+        frames (int): Frames to run for each state.
+        names (list): States to benchmark. Defaults to every state except loading, which only waits on the loader.
+
+    Returns:
+        results (dict): State names mapped to their frame time percentiles in
+            milliseconds and their allocations per frame.
+    """
+    game = setup(headless=True, fast_forward=True, seed=0)
+    loader.AssetLoader(states.ASSET_TIERS).run()
+    if names is None:
+        names = [name for name in game.factories if name != 'loading']
+    results = {}
+    for name in names:
+        times, blocks = run_frames(game, name, frames)
+        peaks = peak_bytes(game, name, min(frames, 120))
+        results[name] = {
+            'frames': frames,
+            'p50': tools.percentile(times, 50),
+            'p95': tools.percentile(times, 95),
+            'p99': tools.percentile(times, 99),
+            'blocks_per_frame': sum(blocks) / len(blocks) if blocks else 0.0,
+            'peak_bytes_per_frame': tools.percentile(peaks, 50)
+            }
+        logger.info('%-13s p50 %6.3fms  p95 %6.3fms  p99 %6.3fms', name,
+                    results[name]['p50'], results[name]['p95'], results[name]['p99'])
+    tools.sound_bank.report()
+    pygame.quit()
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Compares benchmark results against a baseline.
+
+    Args:
+        results (dict): Benchmark results.
+        baseline (dict): Baseline results of the same form.
+        threshold (float): Allowed growth of the p95 frame time, as a fraction of the baseline.
+            Growth under NOISE_FLOOR milliseconds is always allowed.
+
+    Returns:
+        regressions (list): Names of the states whose p95 frame time grew beyond the threshold.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            logger.warning('%s is not in the baseline, run with --save-baseline to add it', name)
+            continue
+        limit = max(baseline[name]['p95'] * (1 + threshold), baseline[name]['p95'] + NOISE_FLOOR)
+        if result['p95'] > limit:
+            logger.warning('%s regressed: p95 %.3fms, baseline %.3fms', name, result['p95'], baseline[name]['p95'])
+            regressions.append(name)
+    return regressions
+
+
+def parse_args(argv):
+    """Parse the command line options of the benchmark.
+
+    Args:
+        argv (list): Command line arguments, without the program name.
+
+    Returns:
+        args (obj): The parsed options.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the frame time of each game state.')
+    parser.add_argument('--frames', type=int, default=600, help='frames to run for each state')
+    parser.add_argument('--states', nargs='+', help='states to benchmark')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='where to write the results')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='allowed p95 growth, e.g. 0.2 for 20%%')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Runs the benchmark from the command line.
+
+    Args:
+        argv (list): Command line arguments, without the program name. Defaults to sys.argv.
+
+    Returns:
+        status (int): 1 if a state regressed, 2 if there is no baseline, otherwise 0.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(name)s: %(message)s')
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    results = benchmark(args.frames, args.states)
+    with open(args.output, 'w') as output_file:
+        json.dump(results, output_file, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        logger.info('Saved baseline to %s', args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        logger.warning('No baseline at %s, run with --save-baseline to store one', args.baseline)
+        return 2
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""Bundle
+
+This module packs the game images into a single bundle of raw pixels
+in the display format, which the game memory-maps at startup instead
+of decoding every image file.
+
+The line-art frames only use a few hundred colors, so the bundle can
+instead be built with every image quantized to an 8-bit palette, which
+takes a quarter of the memory. The palettized surfaces are converted to
+the display format by the blit that draws them. Building it with a
+palette requires NumPy.
+
+The game only checks the version in the bundle header, so rebuild the
+bundle after changing an image. The check command compares the SHA-1
+of each image file against the manifest in the bundle index.
+
+Usage:
+    python -m data.bundle build [--palette]
+    python -m data.bundle check
+    python -m data.bundle benchmark
+    python -m data.bundle report
+"""
+
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import images
+from . import state_machine
+from . import tasks
+from . import tools
+
+
+PALETTE_SIZE = 256
+PALETTE_SEED_COLORS = 64
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.bmp')
+
+
+def pixel_format():
+    """Finds the raw pixel format that matches the display format of alpha surfaces.
+
+    Returns:
+        pixel_format (str): Format string for pygame.image.tostring and frombuffer.
+    """
+    surface = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha()
+    red_mask = surface.get_masks()[0]
+    if red_mask == 0x00ff0000:
+        return 'BGRA'
+    elif red_mask == 0x0000ff00:
+        return 'ARGB'
+    return 'RGBA'
+
+
+def quantize(surface):
+    """Quantizes a surface to an 8-bit palette.
+
+    The palette starts with the most common colors, which are the flat
+    colors of the line art, and is filled by repeatedly adding the color
+    with the largest total error, which picks up the anti-aliased edges.
+    Pixels that are more than half transparent share one transparent entry.
+    Each distinct color is handled once, as NumPy arrays. Requires NumPy.
+
+    Args:
+        surface (obj): The surface to quantize.
+
+    Returns:
+        indices (bytes): One palette index per pixel, row by row.
+        palette (list): The (r, g, b) colors of the palette.
+        transparent (int): Palette index of the transparent pixels, or None if there are none.
+    """
+    pixels = np.frombuffer(pygame.image.tostring(surface, 'RGBA'), np.uint8).reshape(-1, 4)
+    opaque = pixels[:, 3] >= 128
+    transparent = None if opaque.all() else 0
+    first = 0 if transparent is None else 1
+    rgb = pixels[opaque, :3].astype(np.int64)
+    colors, inverse, counts = np.unique(rgb[:, 0] << 16 | rgb[:, 1] << 8 | rgb[:, 2],
+                                        return_inverse=True, return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    colors = np.stack([colors[order] >> 16, colors[order] >> 8 & 0xff, colors[order] & 0xff], axis=1)
+    weights = counts[order]
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    slots = PALETTE_SIZE - first
+    if len(colors) <= slots:
+        chosen = list(range(len(colors)))
+        nearest = np.arange(len(colors)) + first
+    else:
+        chosen = []
+        nearest = np.zeros(len(colors), np.int64)
+        error = np.full(len(colors), np.inf)
+        for index in range(PALETTE_SEED_COLORS):
+            nearest, error = add_palette_color(colors, index, first + len(chosen), nearest, error)
+            chosen.append(index)
+        while len(chosen) < slots:
+            worst = int(np.argmax(error * weights))
+            if not error[worst]:
+                break
+            nearest, error = add_palette_color(colors, worst, first + len(chosen), nearest, error)
+            chosen.append(worst)
+    palette = [(0, 0, 0)] * first + [tuple(int(channel) for channel in colors[index]) for index in chosen]
+    indices = np.zeros(len(pixels), np.uint8)
+    indices[opaque] = nearest[rank[inverse.ravel()]]
+    return indices.tobytes(), palette, transparent
+
+
+def add_palette_color(colors, color, index, nearest, error):
+    """Updates the nearest palette entry of each color after a color is added to the palette.
+
+    Args:
+        colors (obj): The (r, g, b) colors of the image as an array.
+        color (int): Position in colors of the color added to the palette.
+        index (int): Palette index of the new color.
+        nearest (obj): Palette index nearest to each color.
+        error (obj): Squared distance of each color to its nearest palette entry.
+
+    Returns:
+        nearest (obj): The updated palette indices.
+        error (obj): The updated squared distances.
+    """
+    distance = ((colors - colors[color]) ** 2).sum(axis=1)
+    closer = distance < error
+    nearest[closer] = index
+    error[closer] = distance[closer]
+    return nearest, error
+
+
+def file_sha1(path):
+    """Returns the SHA-1 of a file as a hex string.
+
+    Args:
+        path (str): Path to the file.
+    """
+    with open(path, 'rb') as hashed_file:
+        return hashlib.sha1(hashed_file.read()).hexdigest()
+
+
+def build_bundle(directory=tools.IMG_DIR, path=tools.BUNDLE_PATH, extensions=IMAGE_EXTENSIONS, palette=False):
+    """Packs all images with the specified file extensions into a bundle.
+
+    The bundle is a header, the pixel data of each image aligned to
+    images.BUNDLE_ALIGN bytes, and a JSON index at the end. The index keeps
+    the SHA-1 of each source file as a manifest for the check command.
+
+    Args:
+        directory (str): Path to the directory that contains the files.
+        path (str): Path of the bundle to write.
+        extensions (tup): The file extensions accepted by the function.
+        palette (bool): Quantizes every image to an 8-bit palette, which requires NumPy.
+
+    Returns:
+        count (int): Number of images in the bundle.
+    """
+    if palette and np is None:
+        raise ImportError('Building a palettized bundle requires NumPy')
+    fmt = pixel_format()
+    index = {}
+    data_start = images.bundle_align(images.BUNDLE_HEADER.size)
+    offset = 0
+    with open(path, 'wb') as bundle_file:
+        bundle_file.write(b'\0' * data_start)
+        for img in sorted(os.listdir(directory)):
+            name, ext = os.path.splitext(img)
+            if ext not in extensions:
+                continue
+            source = os.path.join(directory, img)
+            surface = images.load_image(source)
+            index[name] = {
+                'file': img,
+                'sha1': file_sha1(source),
+                'offset': offset,
+                'size': surface.get_size(),
+                'format': fmt,
+                'alpha': bool(surface.get_flags() & pygame.SRCALPHA)
+                }
+            if palette:
+                pixels, colors, transparent = quantize(surface)
+                index[name].update(format='P', palette=colors, transparent=transparent)
+            else:
+                pixels = pygame.image.tostring(surface, fmt)
+            padding = images.bundle_align(len(pixels)) - len(pixels)
+            bundle_file.write(pixels + b'\0' * padding)
+            offset += len(pixels) + padding
+        index_data = json.dumps(index, sort_keys=True).encode('utf-8')
+        bundle_file.write(index_data)
+        bundle_file.seek(0)
+        bundle_file.write(images.BUNDLE_HEADER.pack(
+            images.BUNDLE_MAGIC, images.BUNDLE_VERSION, data_start + offset, len(index_data)))
+    return len(index)
+
+
+def stale_images(directory=tools.IMG_DIR, path=tools.BUNDLE_PATH, extensions=IMAGE_EXTENSIONS):
+    """Compares the image files against the manifest of a bundle.
+
+    Args:
+        directory (str): Path to the directory that contains the files.
+        path (str): Path to the bundle.
+        extensions (tup): The file extensions of the images.
+
+    Returns:
+        stale (list): Filenames of the images that were added, removed, or changed since the bundle was built.
+    """
+    bundle = images.ImageBundle(path)
+    manifest = {entry['file']: entry['sha1'] for entry in bundle.index.values()}
+    bundle.close()
+    files = {img for img in os.listdir(directory) if os.path.splitext(img)[1] in extensions}
+    stale = files.symmetric_difference(manifest)
+    for img in files & set(manifest):
+        if file_sha1(os.path.join(directory, img)) != manifest[img]:
+            stale.add(img)
+    return sorted(stale)
+
+
+def time_load(source, directory=tools.IMG_DIR, path=tools.BUNDLE_PATH):
+    """Times loading and first drawing every image of the bundle from one source.
+
+    Each image is blitted once, since the mapped pixels of the bundle are
+    only read from disk when they are first drawn.
+
+    Args:
+        source (str): 'loose' to decode the image files, or 'bundle' to read the bundle.
+        directory (str): Path to the directory that contains the files.
+        path (str): Path to the bundle.
+
+    Returns:
+        seconds (float): Time taken to load and draw the images.
+    """
+    screen = pygame.Surface(state_machine.WINDOW_SIZE)
+    start = time.perf_counter()
+    bundle = images.ImageBundle(path)
+    for name, entry in bundle.index.items():
+        if source == 'loose':
+            surface = images.load_image(os.path.join(directory, entry['file']))
+        else:
+            surface = bundle.surface(name)
+        screen.blit(surface, (0, 0))
+    return time.perf_counter() - start
+
+
+def benchmark(directory=tools.IMG_DIR, path=tools.BUNDLE_PATH):
+    """Times loading every image from the loose files and from the bundle.
+
+    Each path is timed in a fresh process, so neither gets the decoded
+    images or warm allocator of the other. Files that were read recently
+    may still be in the OS page cache, so run it right after a reboot for
+    a true cold start.
+
+    Args:
+        directory (str): Path to the directory that contains the files.
+        path (str): Path to the bundle.
+
+    Returns:
+        times (dict): Seconds taken by each path.
+    """
+    times = {}
+    for source in ('loose', 'bundle'):
+        output = subprocess.run([sys.executable, '-m', 'data.bundle', 'time', source, directory, path],
+                                check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        times[source] = float(output.splitlines()[-1])
+    return times
+
+
+def report(path=tools.BUNDLE_PATH, repeat=50):
+    """Compares palettized frames of each task against their display format copies.
+
+    Args:
+        path (str): Path to a bundle built with a palette.
+        repeat (int): Times each frame is blitted for the timing.
+
+    Returns:
+        results (dict): Task names mapped to the bytes of their frames and the
+            milliseconds per full-screen blit, palettized and in the display format.
+    """
+    bundle = images.ImageBundle(path)
+    screen = pygame.display.get_surface()
+    results = {}
+    for name, task in tasks.TASKS.items():
+        names = [frame for frame in tasks.frame_names(task) if frame in bundle]
+        if not names:
+            continue
+        frames = [bundle.surface(frame) for frame in names]
+        converted = [surface.convert_alpha() if bundle.index[frame]['alpha'] else surface.convert()
+                     for frame, surface in zip(names, frames)]
+        result = {'palette_bytes': 0, 'display_bytes': 0}
+        for key, surfaces in (('palette', frames), ('display', converted)):
+            result[key + '_bytes'] = sum(images.surface_bytes(surface) for surface in surfaces)
+            start = time.perf_counter()
+            for i in range(repeat):
+                for surface in surfaces:
+                    screen.blit(surface, (0, 0))
+            result[key + '_blit_ms'] = (time.perf_counter() - start) * 1000.0 / (repeat * len(surfaces))
+        results[name] = result
+    return results
+
+
+def main(argv):
+    """Builds, checks, or benchmarks the image bundle from the command line.
+
+    Args:
+        argv (list): Command line arguments.
+
+    Returns:
+        status (int): 1 if the check found stale images, otherwise 0.
+    """
+    command = argv[1] if len(argv) > 1 else 'build'
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    status = 0
+    if command == 'build':
+        count = build_bundle(palette='--palette' in argv)
+        print('Packed {} images into {}'.format(count, tools.BUNDLE_PATH))
+    elif command == 'check':
+        stale = stale_images()
+        for img in stale:
+            print('{} changed since {} was built'.format(img, tools.BUNDLE_PATH))
+        if stale:
+            print('Rebuild it with python -m data.bundle build')
+            status = 1
+    elif command == 'time':
+        print(time_load(*argv[2:5]))
+    elif command == 'benchmark':
+        times = benchmark()
+        print('loose files: {:.3f}s'.format(times['loose']))
+        print('bundle:      {:.3f}s'.format(times['bundle']))
+    elif command == 'report':
+        pygame.display.set_mode(state_machine.WINDOW_SIZE)
+        for name, result in report().items():
+            print('{:<13} {:6.1f}MB -> {:5.1f}MB   blit {:.3f}ms -> {:.3f}ms'.format(
+                name, result['display_bytes'] / 2 ** 20, result['palette_bytes'] / 2 ** 20,
+                result['display_blit_ms'], result['palette_blit_ms']))
+    else:
+        print(__doc__)
+    pygame.quit()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,554 @@
+"""Images
+
+This module contains the image cache, the reader of packed image
+bundles, and the delta frames the task frames are stored as.
+"""
+
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import pygame
+
+from . import runtime
+
+
+logger = logging.getLogger(__name__)
+
+
+# packed image bundle
+BUNDLE_MAGIC = b'STICKBOP'
+BUNDLE_VERSION = 2
+BUNDLE_HEADER = struct.Struct('<8sIQI')
+BUNDLE_ALIGN = 16
+
+# size in pixels of the tiles the changed regions of a delta frame are made of
+DELTA_TILE = 32
+
+# memory budget for decoded images, patches and task bases in bytes, half of the 126 MB of images
+# of a game at 1000x800, which fits the pinned frames of the current and next task, at most 41 MB
+IMAGE_BUDGET = 64 * 1024 * 1024
+
+
+class DeltaFrame:
+    """A task frame stored as the regions that differ from the first frame of its task.
+
+    Every frame of a task shares the base surface, so only the changed
+    regions of each frame are kept in memory and blitted when frames change.
+    The regions are runs of DELTA_TILE sized tiles, so scattered changes
+    don't pull in the unchanged pixels between them.
+
+    Attributes:
+        base (obj): The first frame of the task.
+        patches (list): The surface and rect of each changed region. Empty if the frame matches the base.
+        rects (list): Position and size of each changed region.
+    """
+
+    def __init__(self, base, patches):
+        self.base = base
+        self.patches = patches
+        self.rects = [rect for patch, rect in patches]
+
+    def get_size(self):
+        return self.base.get_size()
+
+    def compose(self):
+        """Returns the frame as a full surface.
+
+        Palettized frames are composed in the display format, since each
+        patch has its own palette, which the palette of the base would not match.
+        """
+        surface = self.base.convert() if self.base.get_bitsize() == 8 else self.base.copy()
+        for patch, rect in self.patches:
+            surface.blit(patch, rect)
+        return surface
+
+    def draw(self, screen, area=None):
+        """Draws the frame, or one area of it, to the screen.
+
+        Args:
+            screen (obj): Surface to draw on.
+            area (obj): Rect of the frame to draw. Draws the whole frame if None.
+
+        Returns:
+            rect (obj): The area of the screen that was drawn on.
+        """
+        if area is None:
+            screen.blit(self.base, (0, 0))
+            for patch, rect in self.patches:
+                screen.blit(patch, rect)
+            return screen.get_rect()
+        area = pygame.Rect(area)
+        screen.blit(self.base, area, area)
+        for patch, rect in self.patches:
+            clip = area.clip(rect)
+            if clip.width and clip.height:
+                screen.blit(patch, clip, clip.move(-rect.x, -rect.y))
+        return area
+
+    def draw_over(self, previous, screen):
+        """Draws the frame over a previous frame of the same task.
+
+        The regions of the previous frame are restored from the base, then
+        the regions of this frame are drawn over them.
+
+        Args:
+            previous (obj): The frame currently on the screen.
+            screen (obj): Surface to draw on.
+
+        Returns:
+            dirty_rects (list): Areas of the screen that changed.
+        """
+        if previous is self:
+            return []
+        for rect in previous.rects:
+            screen.blit(self.base, rect, rect)
+        for patch, rect in self.patches:
+            screen.blit(patch, rect)
+        return previous.rects + self.rects
+
+
+class ImageBundle:
+    """Memory-maps a bundle of raw image pixels built by data.bundle.
+
+    Surfaces are created straight from the mapped pixels, so no image decoding is done.
+    Images packed with a palette ('P' format) stay 8-bit surfaces and are
+    converted to the display format by the blit that draws them.
+
+    Attributes:
+        path (str): Path to the bundle file.
+        index (dict): Offset, size, pixel format, and the source file with its SHA-1 of each image.
+        data_start (int): Offset of the pixel data in the bundle.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as bundle_file:
+            self.map = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, index_start, index_size = BUNDLE_HEADER.unpack_from(self.map, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError('Not a version {} image bundle: {}'.format(BUNDLE_VERSION, path))
+        self.index = json.loads(self.map[index_start:index_start + index_size].decode('utf-8'))
+        self.data_start = bundle_align(BUNDLE_HEADER.size)
+        self.alpha_masks = None
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def close(self):
+        """Unmaps the bundle."""
+        self.map.close()
+
+    def nbytes(self, name):
+        """Returns the number of bytes of pixel data of an image."""
+        entry = self.index[name]
+        width, height = entry['size']
+        return width * height * (1 if entry['format'] == 'P' else 4)
+
+    def surface(self, name, colorkey=(0, 0, 0)):
+        """Creates a surface from the mapped pixels of an image.
+
+        The surface shares memory with the bundle unless the display uses
+        a different pixel format, in which case it is converted.
+
+        Args:
+            name (str): Name of the image.
+            colorkey  (tup): Used to set colorkey if no alpha transparency is found in image.
+
+        Returns:
+            img (obj): The image.
+        """
+        entry = self.index[name]
+        start = self.data_start + entry['offset']
+        pixels = memoryview(self.map)[start:start + self.nbytes(name)]
+        img = pygame.image.frombuffer(pixels, tuple(entry['size']), entry['format'])
+        if entry['format'] == 'P':
+            img.set_palette([tuple(color) for color in entry['palette']])
+            if entry['transparent'] is not None:
+                img.set_colorkey(entry['transparent'])
+            elif not entry['alpha']:
+                img.set_colorkey(colorkey)
+        elif entry['alpha']:
+            if self.alpha_masks is None:
+                self.alpha_masks = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha().get_masks()
+            if img.get_masks() != self.alpha_masks:
+                img = img.convert_alpha()
+        else:
+            img = img.convert()
+            img.set_colorkey(colorkey)
+        return img
+
+
+class ImageCache(Mapping):
+    """Maps image names to surfaces, decoding each image on first access.
+
+    Decoded surfaces are kept in least recently used order and evicted once
+    their total size goes over the memory budget. Pinned images, such as the
+    frames of the current and next task, are never evicted. The base frames
+    of the tasks count towards the budget, and each one is dropped along
+    with the last resident frame of its task.
+
+    Attributes:
+        budget (int): Maximum bytes of decoded surfaces and bases to keep resident.
+        colorkey (tup): Used to set colorkey if no alpha transparency is found in image.
+        paths (dict): File paths of the known images.
+        bundle (obj): Image bundle to read images from instead of their files, if any.
+        placeholders (bool): Returns a blank 1x1 surface for every image instead of decoding it,
+            for runs that only need the state transitions.
+        surfaces (obj): Decoded surfaces in least recently used order.
+        bases (dict): First frame of each task that the delta frames are stored against.
+        base_users (dict): Number of resident delta frames of each task.
+        pinned (set): Names of the images that are kept resident over the budget.
+        resident_bytes (int): Bytes held by the decoded surfaces and patches, not counting the bases.
+        base_bytes (int): Bytes held by the bases.
+        hits (int): Lookups served from memory.
+        misses (int): Lookups that had to decode the image.
+        evictions (int): Surfaces dropped to stay under the budget.
+        lock (obj): Guards the cache while it is filled from a worker thread.
+    """
+
+    def __init__(self, budget=IMAGE_BUDGET, colorkey=(0, 0, 0)):
+        self.lock = threading.RLock()
+        self.budget = budget
+        self.colorkey = colorkey
+        self.paths = {}
+        self.bundle = None
+        self.placeholders = False
+        self.surfaces = OrderedDict()
+        self.bases = {}
+        self.base_users = {}
+        self.pinned = set()
+        self.resident_bytes = 0
+        self.base_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, name):
+        with self.lock:
+            surface = self.surfaces.get(name)
+            if surface is not None:
+                self.surfaces.move_to_end(name)
+                self.hits += 1
+                return surface
+            self.misses += 1
+            runtime.count_load()
+            surface = self.decode(name)
+            self.store(name, surface)
+            self.evict()
+            return surface
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, name):
+        return name in self.paths
+
+    def peek(self, name):
+        """Returns the decoded surface of an image if it is resident, without decoding it or waiting for the lock.
+
+        Args:
+            name (str): Name of the image.
+
+        Returns:
+            surface (obj): The decoded surface or delta frame, or None if it is not resident.
+        """
+        return self.surfaces.get(name)
+
+    def read(self, name):
+        """Reads an image from the bundle, or decodes its file if it isn't bundled.
+
+        Args:
+            name (str): Name of the image.
+
+        Returns:
+            img (obj): The image.
+        """
+        if self.bundle is not None and name in self.bundle:
+            return self.bundle.surface(name, self.colorkey)
+        return load_image(self.paths[name], self.colorkey)
+
+    def file_size(self, name):
+        """Returns the number of bytes read to load an image.
+
+        Args:
+            name (str): Name of the image.
+
+        Returns:
+            size (int): Size of the bundled pixels or of the image file.
+        """
+        if self.bundle is not None and name in self.bundle:
+            return self.bundle.nbytes(name)
+        return os.path.getsize(self.paths[name])
+
+    def frame_task(self, name):
+        """Returns the task of a numbered task frame such as 'hammering-5', or None for other images.
+
+        Args:
+            name (str): Name of the image.
+        """
+        task, sep, frame = name.rpartition('-')
+        if sep and frame.isdigit() and task + '-1' in self.paths:
+            return task
+        return None
+
+    def decode(self, name):
+        """Decodes an image.
+
+        Numbered task frames are stored as a delta against the first frame
+        of their task, which is kept as the base while any frame of the task
+        is resident. The first frame itself is the base with no patch, so it
+        is not read again while its base is resident.
+
+        Args:
+            name (str): Name of the image.
+
+        Returns:
+            surface (obj): The decoded surface or delta frame.
+        """
+        if self.placeholders:
+            return pygame.Surface((1, 1))
+        task = self.frame_task(name)
+        if task is None:
+            return self.read(name)
+        base = self.bases.get(task)
+        if base is None:
+            base = self.read(task + '-1')
+        surface = base if name == task + '-1' else self.read(name)
+        return make_delta_frame(base, surface)
+
+    def store(self, name, surface):
+        """Adds a decoded surface to the cache, and the base of a delta frame if it is new.
+
+        Args:
+            name (str): Name of the image.
+            surface (obj): The decoded surface or delta frame.
+        """
+        self.surfaces[name] = surface
+        self.resident_bytes += surface_bytes(surface)
+        if isinstance(surface, DeltaFrame):
+            task = self.frame_task(name)
+            if task not in self.bases:
+                self.bases[task] = surface.base
+                self.base_bytes += surface_bytes(surface.base)
+            self.base_users[task] = self.base_users.get(task, 0) + 1
+
+    def release(self, name):
+        """Removes a surface from the cache, and the base of a delta frame once no frame of its task is left.
+
+        Args:
+            name (str): Name of the image.
+        """
+        surface = self.surfaces.pop(name)
+        self.resident_bytes -= surface_bytes(surface)
+        if isinstance(surface, DeltaFrame):
+            task = self.frame_task(name)
+            self.base_users[task] -= 1
+            if not self.base_users[task]:
+                del self.base_users[task]
+                self.base_bytes -= surface_bytes(self.bases.pop(task))
+
+    def add(self, name, path):
+        """Registers an image file without decoding it.
+
+        Args:
+            name (str): Name used to look up the image.
+            path (str): Path to the image file.
+        """
+        with self.lock:
+            self.paths[name] = path
+            self.discard(name)
+
+    def discard(self, name):
+        """Drops the decoded surface of an image if it is resident.
+
+        Args:
+            name (str): Name of the image.
+        """
+        with self.lock:
+            if name in self.surfaces:
+                self.release(name)
+
+    def pin(self, names):
+        """Pins images so they are not evicted, replacing the previous pins.
+
+        Args:
+            names (list): Names of the images to pin.
+        """
+        with self.lock:
+            self.pinned = set(names)
+
+    def evict(self):
+        """Drops least recently used surfaces until the cache is within budget.
+
+        Pinned surfaces and the most recently used surface are always kept.
+        """
+        if self.resident_bytes + self.base_bytes <= self.budget:
+            return
+        newest = next(reversed(self.surfaces), None)
+        for name in list(self.surfaces):
+            if self.resident_bytes + self.base_bytes <= self.budget:
+                break
+            if name in self.pinned or name == newest:
+                continue
+            self.release(name)
+            self.evictions += 1
+
+    def full(self):
+        """Returns whether the decoded surfaces have filled the memory budget."""
+        return self.resident_bytes + self.base_bytes >= self.budget
+
+    def stats(self):
+        """Returns the cache counters.
+
+        Returns:
+            stats (dict): Resident bytes, base bytes and surfaces, hits, misses, and evictions.
+        """
+        return {
+            'resident_bytes': self.resident_bytes,
+            'base_bytes': self.base_bytes,
+            'resident': len(self.surfaces),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+            }
+
+
+def surface_bytes(surface):
+    """Returns the number of bytes of pixel data held by a surface.
+
+    A delta frame only counts its patches, since the base is shared by its task.
+
+    Args:
+        surface (obj): The surface or delta frame to measure.
+
+    Returns:
+        size (int): Bytes of pixel data.
+    """
+    if isinstance(surface, DeltaFrame):
+        return sum(patch.get_pitch() * patch.get_height() for patch, rect in surface.patches)
+    return surface.get_pitch() * surface.get_height()
+
+
+def changed_regions(mask, tile=DELTA_TILE):
+    """Covers the set bits of a mask with rects made of whole tiles.
+
+    The changed tiles of each row are joined into runs, and a run is
+    extended down while the row below has a run with the same span.
+
+    Args:
+        mask (obj): Mask of the changed pixels.
+        tile (int): Width and height of a tile in pixels.
+
+    Returns:
+        rects (list): Rects covering every set bit.
+    """
+    width, height = mask.get_size()
+    bounds = pygame.Rect(0, 0, width, height)
+    tile_mask = pygame.mask.Mask((tile, tile), fill=True)
+    rects = []
+    above = {}
+    for y in range(0, height, tile):
+        runs = {}
+        x = 0
+        while x < width:
+            start = x
+            while x < width and mask.overlap_area(tile_mask, (x, y)):
+                x += tile
+            if x == start:
+                x += tile
+                continue
+            run = pygame.Rect(start, y, x - start, tile).clip(bounds)
+            rect = above.get((run.x, run.width))
+            if rect is not None:
+                rect.height += run.height
+            else:
+                rect = run
+                rects.append(rect)
+            runs[(run.x, run.width)] = rect
+        above = runs
+    return rects
+
+
+def make_delta_frame(base, frame):
+    """Cuts a frame down to the regions that differ from the base frame.
+
+    Args:
+        base (obj): The first frame of the task.
+        frame (obj): The frame to cut down.
+
+    Returns:
+        delta (obj): The delta frame.
+    """
+    if frame is base:
+        return DeltaFrame(base, [])
+    if frame.get_bitsize() == 8:
+        # the colors are compared in the display format, since blend blits work on pixel values
+        base_copy = base.convert()
+        diff = frame.convert()
+    else:
+        base_copy = base.copy()
+        diff = frame.copy()
+    base_copy.set_colorkey(None)
+    diff.set_colorkey(None)
+    diff.blit(base_copy, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+    base_copy.blit(frame, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+    diff.blit(base_copy, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+    mask = pygame.mask.from_threshold(diff, (0, 0, 0, 255), (1, 1, 1, 255))
+    mask.invert()
+    return DeltaFrame(base, [(frame.subsurface(rect).copy(), rect) for rect in changed_regions(mask)])
+
+
+def load_image(path, colorkey=(0, 0, 0)):
+    """Loads an image and converts it to the display format.
+
+    Args:
+        path (str): Path to the image file.
+        colorkey  (tup): Used to set colorkey if no alpha transparency is found in image.
+
+    Returns:
+        img (obj): The loaded image.
+    """
+    img = pygame.image.load(path)
+    if img.get_alpha():
+        img = img.convert_alpha()
+    else:
+        img = img.convert()
+        img.set_colorkey(colorkey)
+    return img
+
+
+def bundle_align(offset):
+    """Rounds an offset up to the alignment of the pixel data in an image bundle."""
+    return (offset + BUNDLE_ALIGN - 1) // BUNDLE_ALIGN * BUNDLE_ALIGN
+
+
+def open_bundle(path):
+    """Opens an image bundle if it exists and has the current bundle version.
+
+    Only the header is checked, so no image file is read. Whether the bundle
+    still matches the image files is checked by python -m data.bundle check.
+
+    Args:
+        path (str): Path to the image bundle.
+
+    Returns:
+        bundle (obj): The image bundle, or None if there is no usable bundle.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        bundle = ImageBundle(path)
+    except ValueError as error:
+        logger.warning('%s, loading the image files instead', error)
+        return None
+    return bundle
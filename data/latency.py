@@ -0,0 +1,74 @@
+"""Latency
+
+This module measures the latency from a key press to the present of the
+first frame that shows its result, for each state.
+
+Pygame does not timestamp input events, so each key press is bracketed.
+The lower bound is measured from the moment the event loop polled the
+event. The upper bound is measured from the previous poll, since the key
+may have arrived at any time after it, including during the update and
+present of the previous frame and the wait for this one. The true
+latency lies between the two.
+"""
+
+
+import collections
+import json
+import logging
+
+from . import tools
+
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Collects input-to-display latencies per state.
+
+    Attributes:
+        samples (dict): State names mapped to lists of (lower, upper) latencies in milliseconds.
+    """
+
+    def __init__(self):
+        self.samples = collections.defaultdict(list)
+
+    def record(self, state_name, input_time, present_time):
+        """Records the latency of one key press.
+
+        Args:
+            state_name (str): The state that handled the key.
+            input_time (tup): perf_counter seconds of the previous poll and of the poll that returned the key.
+            present_time (float): perf_counter seconds after the display update that showed the result.
+        """
+        previous_poll, polled = input_time
+        self.samples[state_name].append(((present_time - polled) * 1000.0, (present_time - previous_poll) * 1000.0))
+
+    def summary(self):
+        """Summarizes the latencies of each state.
+
+        Returns:
+            summary (dict): State names mapped to the number of samples and the
+                p50, p95 and p99 of the lower and upper bounds in milliseconds.
+        """
+        summary = {}
+        for state_name, samples in sorted(self.samples.items()):
+            lower = [sample[0] for sample in samples]
+            upper = [sample[1] for sample in samples]
+            summary[state_name] = {'count': len(samples)}
+            for percent in (50, 95, 99):
+                summary[state_name]['lower_p{}'.format(percent)] = tools.percentile(lower, percent)
+                summary[state_name]['upper_p{}'.format(percent)] = tools.percentile(upper, percent)
+        return summary
+
+    def export(self, path):
+        """Writes the summary and every sample to a JSON file, and logs the summary.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+        summary = self.summary()
+        for state_name, stats in summary.items():
+            logger.info('%-13s %4d presses  p50 %.1f-%.1fms  p95 %.1f-%.1fms', state_name, stats['count'],
+                        stats['lower_p50'], stats['upper_p50'], stats['lower_p95'], stats['upper_p95'])
+        with open(path, 'w') as latency_file:
+            json.dump({'summary': summary, 'samples': self.samples}, latency_file, indent=2, sort_keys=True)
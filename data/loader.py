@@ -0,0 +1,179 @@
+"""Loader
+
+This module contains the worker threads that load the assets: the
+asset loader started by the loading screen, and the prefetcher that
+decodes the images of the next state.
+"""
+
+
+import logging
+import os
+import queue
+import threading
+import time
+
+from . import audio
+from . import tools
+
+
+logger = logging.getLogger(__name__)
+
+
+class AssetLoader(threading.Thread):
+    """Loads all assets on a worker thread and reports its progress.
+
+    Sounds, fonts, and images are registered first. The assets are then
+    loaded in tiers, in the order of the states that first need them.
+    Sounds are only read into memory here, and the sound bank decodes them
+    on the main thread, so the worker never touches the mixer.
+    The loading screen only waits for the first tier. Later tiers are
+    loaded while streaming is allowed, so the worker stays out of the way
+    of the states that turn it off. A state that starts before its tier
+    is loaded decodes its own assets on first use. Images outside the tiers
+    are decoded last, until the image cache reaches its memory budget.
+
+    Attributes:
+        tiers (list): (tier name, image names, sound names) in load order.
+        ready (dict): Tier names mapped to events that are set once the tier is loaded.
+        streaming (obj): Set while the worker may load assets past the first tier.
+        total_bytes (int): Size of the image files of the first tier, or of all images if there are no tiers.
+        bytes_done (int): Size of those image files loaded so far.
+        current_file (str): The file being loaded.
+        tier_times (dict): Seconds from the start of loading until each tier was loaded.
+        load_time (float): Seconds the loading took.
+        error (obj): Exception raised by the worker, if any.
+        done (bool): Loading completion status.
+    """
+
+    def __init__(self, tiers=()):
+        threading.Thread.__init__(self, name='asset-loader', daemon=True)
+        self.tiers = list(tiers)
+        self.ready = {name: threading.Event() for name, tier_images, tier_sounds in self.tiers}
+        self.streaming = threading.Event()
+        self.streaming.set()
+        self.total_bytes = 0
+        self.bytes_done = 0
+        self.current_file = ''
+        self.tier_times = {}
+        self.load_time = 0.0
+        self.error = None
+        self.done = False
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            tools.load_sounds(tools.SND_DIR)
+            tools.load_fonts(tools.FNT_DIR)
+            tools.load_images(tools.IMG_DIR)
+            tiered = set()
+            for index, (name, tier_images, tier_sounds) in enumerate(self.tiers):
+                if index == 0:
+                    self.total_bytes = sum(tools.images.file_size(image) for image in tier_images)
+                for sound in tier_sounds:
+                    if index:
+                        self.streaming.wait()
+                    self.load_sound(sound)
+                for image in tier_images:
+                    if index:
+                        self.streaming.wait()
+                    self.load_image(image, counted=index == 0)
+                tiered.update(tier_images)
+                self.tier_times[name] = time.perf_counter() - start
+                self.ready[name].set()
+                logger.info('Loaded asset tier %s at %.2fs', name, self.tier_times[name])
+            rest = [image for image in tools.images.paths if image not in tiered]
+            if not self.tiers:
+                self.total_bytes = sum(tools.images.file_size(image) for image in rest)
+            for image in rest:
+                self.streaming.wait()
+                self.load_image(image, counted=not self.tiers)
+        except Exception as error:
+            self.error = error
+            logger.error('Asset loading failed: %s', error)
+            for ready in self.ready.values():
+                ready.set()
+        self.load_time = time.perf_counter() - start
+        logger.info('Loaded assets in %.2fs', self.load_time)
+        self.done = True
+
+    def load_sound(self, name):
+        """Reads a sound effect or a music track into memory.
+
+        Args:
+            name (str): Name of the sound.
+        """
+        self.current_file = os.path.basename(tools.sounds[name])
+        if name in audio.SOUND_EFFECTS:
+            tools.sound_bank.read(tools.sounds[name])
+        else:
+            tools.music.read(tools.sounds[name])
+
+    def load_image(self, name, counted):
+        """Decodes an image into the image cache, unless the cache is full.
+
+        Args:
+            name (str): Name of the image.
+            counted (bool): Whether the image counts towards the progress.
+        """
+        self.current_file = os.path.basename(tools.images.paths[name])
+        if not tools.images.full():
+            tools.images.get(name)
+        if counted:
+            self.bytes_done += tools.images.file_size(name)
+
+    def tier_ready(self, name):
+        """Returns whether a tier has been loaded."""
+        return self.ready[name].is_set()
+
+    def set_streaming(self, streaming):
+        """Allows or pauses loading past the first tier.
+
+        Args:
+            streaming (bool): Whether the worker may load assets.
+        """
+        if streaming:
+            self.streaming.set()
+        else:
+            self.streaming.clear()
+
+    def progress(self):
+        """Returns the loading progress of the first tier as a percentage."""
+        if not self.total_bytes:
+            return 0
+        return self.bytes_done / self.total_bytes * 100
+
+
+class ImagePrefetcher(threading.Thread):
+    """Decodes the images of prefetched states into the image cache on a worker thread.
+
+    The decoding of an image releases the GIL, so the main thread keeps
+    running frames while the next state's images are decoded. Images are
+    decoded in the order they are requested.
+
+    Attributes:
+        cache (obj): The image cache to decode into.
+        requests (obj): Queue of the names of the images to decode.
+    """
+
+    def __init__(self, cache):
+        threading.Thread.__init__(self, name='image-prefetcher', daemon=True)
+        self.cache = cache
+        self.requests = queue.Queue()
+
+    def run(self):
+        while True:
+            name = self.requests.get()
+            try:
+                self.cache.get(name)
+            except Exception as error:
+                logger.error('Prefetching %s failed: %s', name, error)
+
+    def request(self, names):
+        """Queues the images that are not resident to be decoded.
+
+        Args:
+            names (list): Names of the images.
+        """
+        for name in names:
+            if self.cache.peek(name) is None:
+                self.requests.put(name)
@@ -4,37 +4,139 @@ This module initializes the game loop.
 """
 
 
+import argparse
+import collections
+import functools
+import logging
+import os
 import sys
+import time
 
 import pygame
 
+from . import pacing
 from . import state_machine
 from . import states
+from . import tools
 
 
-def main():
-    """Initialize pygame, state machine, and run the main game loop."""
-    pygame.init()
-    game = state_machine.StateController()
+logger = logging.getLogger(__name__)
+
+
+def setup(**settings):
+    """Initialize pygame and the state machine with all game states.
+
+    Only the display is initialized here. The font and mixer modules are
+    initialized when they are first used, and each state is created the
+    first time it is entered. The time taken by each phase is reported
+    with the first frame.
+
+    Args:
+        **settings: Settings for the state controller. headless=True runs
+            with the SDL dummy video and audio drivers, as does render=False.
+
+    Returns:
+        game (obj): The state controller, ready to run its game loop.
+    """
+    launch_time = settings.pop('launch_time', time.perf_counter())
+    phases = collections.OrderedDict()
+    start = time.perf_counter()
+    if settings.get('headless') or not settings.get('render', True):
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    pygame.display.init()
+    phases['display'] = time.perf_counter() - start
+    start = time.perf_counter()
+    game = state_machine.StateController(launch_time=launch_time, startup_phases=phases, **settings)
+    phases['controller'] = time.perf_counter() - start
     state_dict = {
-        'loading': states.Loading(),
-        'menu': states.Menu(),
-        'start': states.Start(),
-        'loss': states.Loss(),
-        'win': states.Win(),
-        'taskdone': states.Taskdone(),
-        'drilling': states.Drilling(),
-        'mining': states.Mining(),
-        'woodchopping': states.Woodchopping(),
-        'flagraising': states.Flagraising(),
-        'hammering': states.Hammering(),
-        'tirepumping': states.Tirepumping(),
-        'excalibur1': states.Excalibur1(),
-        'excalibur2': states.Excalibur2(),
-        'excalibur3': states.Excalibur3(),
-        'excalibur4': states.Excalibur4()
+        'loading': states.Loading,
+        'menu': states.Menu,
+        'start': states.Start,
+        'loss': states.Loss,
+        'win': states.Win,
+        'taskdone': states.Taskdone,
+        'drilling': functools.partial(states.Task, 'drilling'),
+        'mining': functools.partial(states.Task, 'mining'),
+        'woodchopping': functools.partial(states.Task, 'woodchopping'),
+        'flagraising': functools.partial(states.Task, 'flagraising'),
+        'hammering': functools.partial(states.Task, 'hammering'),
+        'tirepumping': functools.partial(states.Task, 'tirepumping'),
+        'excalibur1': functools.partial(states.Task, 'excalibur1'),
+        'excalibur2': functools.partial(states.Task, 'excalibur2'),
+        'excalibur3': functools.partial(states.Task, 'excalibur3'),
+        'excalibur4': functools.partial(states.Task, 'excalibur4')
         }
+    start = time.perf_counter()
     game.setup_states(state_dict, 'loading')
+    phases['first state'] = time.perf_counter() - start
+    return game
+
+
+def run(**settings):
+    """Run the game until it quits or reaches its frame limit.
+
+    Args:
+        **settings: Settings for the state controller, see setup.
+
+    Returns:
+        stats (dict): Frames run, wall clock seconds, and frames per second.
+    """
+    game = setup(**settings)
+    start = time.perf_counter()
     game.game_loop()
+    elapsed = time.perf_counter() - start
     pygame.quit()
+    stats = {
+        'frames': game.frame_count,
+        'seconds': elapsed,
+        'fps': game.frame_count / elapsed if elapsed else 0.0,
+        'pacing': game.pacer.stats()
+        }
+    logger.info('Ran %d frames in %.2fs (%.0f fps)', stats['frames'], stats['seconds'], stats['fps'])
+    return stats
+
+
+def parse_args(argv):
+    """Parse the command line options of the game.
+
+    Args:
+        argv (list): Command line arguments, without the program name.
+
+    Returns:
+        settings (dict): Settings for the state controller.
+    """
+    parser = argparse.ArgumentParser(description='Stick Bop!')
+    parser.add_argument('--headless', action='store_true', help='run without a window or sound')
+    parser.add_argument('--fast-forward', action='store_true', help='run uncapped on simulated time')
+    parser.add_argument('--no-render', action='store_false', dest='render',
+                        help='skip decoding and drawing images, only run the state transitions; implies --headless')
+    parser.add_argument('--fullscreen', action='store_true', help='run at the size of the display, toggled with F11')
+    parser.add_argument('--scale-quality', choices=tools.SCALE_QUALITIES, default='smooth',
+                        help='how images are scaled to the window')
+    parser.add_argument('--pacing', choices=pacing.PACERS, default='tick', help='how the game loop waits for the next frame')
+    parser.add_argument('--fps', type=float, default=state_machine.FPS, dest='target_fps', help='target frame rate')
+    parser.add_argument('--frames', type=int, dest='max_frames', help='stop after this many frames')
+    parser.add_argument('--clock', choices=state_machine.CLOCKS, default='real', dest='clock_mode',
+                        help='clock used for game time')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='speed of game time for the scaled clock')
+    parser.add_argument('--seed', type=int, help='seed of the random task order')
+    parser.add_argument('--record', dest='record_path', metavar='PATH', help='record the key input to a replay log')
+    parser.add_argument('--replay', dest='replay_path', metavar='PATH', help='play back a replay log instead of the keyboard')
+    parser.add_argument('--latency', dest='latency_path', metavar='PATH',
+                        help='measure input-to-display latency and write it to a JSON file')
+    args = parser.parse_args(argv)
+    return vars(args)
+
+
+def main(argv=None):
+    """Initialize pygame, state machine, and run the main game loop.
+
+    Args:
+        argv (list): Command line arguments, without the program name. Defaults to sys.argv.
+    """
+    launch_time = time.perf_counter()
+    logging.basicConfig(level=logging.INFO, format='%(name)s: %(message)s')
+    settings = parse_args(sys.argv[1:] if argv is None else argv)
+    run(launch_time=launch_time, **settings)
     sys.exit()
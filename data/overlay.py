@@ -0,0 +1,152 @@
+"""Overlay
+
+This module contains the frame-time overlay, which shows how long each
+phase of the game loop takes over the last frames, a histogram of the
+frame times, and how many frames went over the frame budget.
+
+The overlay is toggled with F3, or shown from the start by setting the
+STICKBOP_OVERLAY environment variable to 1.
+"""
+
+
+import collections
+import os
+
+import pygame
+
+from . import tools
+
+
+PHASES = ('tick', 'events', 'update', 'display')
+OVERLAY_KEY = pygame.K_F3
+OVERLAY_ENV = 'STICKBOP_OVERLAY'
+OVERLAY_SIZE = (300, 230)
+OVERLAY_FONT_SIZE = 18
+OVERLAY_REFRESH = 15
+HISTOGRAM_BIN_MS = 2
+HISTOGRAM_BINS = 16
+
+
+def overlay_enabled():
+    """Returns whether the overlay is switched on by the environment."""
+    return os.environ.get(OVERLAY_ENV, '') == '1'
+
+
+class FrameOverlay:
+    """Keeps the phase times of the last frames and draws them on top of the current state.
+
+    The frame time is the work done in a frame, which is every phase but
+    the tick, since the tick only waits for the next frame. The panel is
+    rendered again every OVERLAY_REFRESH frames and blitted in between, so
+    the numbers stay readable and cheap to draw.
+
+    Attributes:
+        visible (bool): Whether the overlay is drawn and frames are recorded.
+        budget (float): Milliseconds a frame may take.
+        times (dict): Phase names mapped to the milliseconds of the last frames.
+        frame_times (obj): Milliseconds of work in each of the last frames.
+        over_budget (obj): State names mapped to their frames over budget.
+        state_name (str): The state of the last recorded frame.
+        panel (obj): The rendered panel, or None if it has to be rendered.
+        rect (obj): The area of the screen covered by the panel.
+        frames (int): Frames recorded since the overlay was shown.
+    """
+
+    def __init__(self, window=240, budget=1000.0 / 60, visible=False):
+        self.visible = visible
+        self.budget = budget
+        self.times = {phase: collections.deque(maxlen=window) for phase in PHASES}
+        self.frame_times = collections.deque(maxlen=window)
+        self.over_budget = collections.Counter()
+        self.state_name = ''
+        self.panel = None
+        self.rect = pygame.Rect((8, 8), OVERLAY_SIZE)
+        self.frames = 0
+
+    def toggle(self):
+        """Shows or hides the overlay. Showing it starts a new recording."""
+        self.visible = not self.visible
+        for times in self.times.values():
+            times.clear()
+        self.frame_times.clear()
+        self.over_budget.clear()
+        self.panel = None
+        self.frames = 0
+
+    def record(self, state_name, tick, events, update, display):
+        """Records the phase times of a frame.
+
+        Args:
+            state_name (str): The state that ran the frame.
+            tick (float): Milliseconds spent waiting for the frame in the pacer and clock.tick.
+            events (float): Milliseconds spent in the event loop.
+            update (float): Milliseconds spent updating the state.
+            display (float): Milliseconds spent updating the display.
+        """
+        for phase, ms in zip(PHASES, (tick, events, update, display)):
+            self.times[phase].append(ms)
+        frame_time = events + update + display
+        self.frame_times.append(frame_time)
+        if frame_time > self.budget:
+            self.over_budget[state_name] += 1
+        self.state_name = state_name
+        self.frames += 1
+        if self.frames % OVERLAY_REFRESH == 0:
+            self.panel = None
+
+    def histogram(self):
+        """Counts the recorded frame times in bins of HISTOGRAM_BIN_MS.
+
+        Returns:
+            counts (list): Frames in each bin. The last bin also holds every longer frame.
+        """
+        counts = [0] * HISTOGRAM_BINS
+        for ms in self.frame_times:
+            counts[min(int(ms / HISTOGRAM_BIN_MS), HISTOGRAM_BINS - 1)] += 1
+        return counts
+
+    def render(self):
+        """Renders the panel with the current statistics.
+
+        Returns:
+            panel (obj): The rendered panel.
+        """
+        panel = pygame.Surface(self.rect.size)
+        panel.fill(tools.BLACK)
+        font = tools.get_font(None, OVERLAY_FONT_SIZE)
+        lines = ['{}  over {:.1f}ms: {}'.format(self.state_name, self.budget, sum(self.over_budget.values()))]
+        for phase in PHASES:
+            times = self.times[phase]
+            mean = sum(times) / len(times) if times else 0.0
+            lines.append('{:<8} avg {:6.2f}  p99 {:6.2f}'.format(phase, mean, tools.percentile(times, 99)))
+        lines.append('frame    p99 {:6.2f}ms'.format(tools.percentile(self.frame_times, 99)))
+        worst = self.over_budget.most_common(1)
+        if worst:
+            lines.append('worst: {} ({})'.format(*worst[0]))
+        y = 4
+        for line in lines:
+            panel.blit(font.render(line, True, tools.WHITE), (6, y))
+            y += font.get_linesize()
+        counts = self.histogram()
+        tallest = max(counts) or 1
+        bar_width = (self.rect.width - 12) // HISTOGRAM_BINS
+        budget_bin = int(self.budget / HISTOGRAM_BIN_MS)
+        for i, count in enumerate(counts):
+            height = int(count / tallest * (self.rect.height - y - 6))
+            color = tools.RED if i >= budget_bin else tools.GREEN
+            bar = pygame.Rect(6 + i * bar_width, self.rect.height - 4 - height, bar_width - 1, height)
+            pygame.draw.rect(panel, color, bar)
+        return panel
+
+    def draw(self, screen):
+        """Draws the overlay on top of the screen.
+
+        Args:
+            screen (obj): Surface to draw on.
+
+        Returns:
+            rect (obj): The area of the screen covered by the overlay.
+        """
+        if self.panel is None:
+            self.panel = self.render()
+        return screen.blit(self.panel, self.rect)
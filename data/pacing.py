@@ -0,0 +1,154 @@
+"""Pacing
+
+This module contains the frame pacing schedulers of the game loop. A
+pacer waits until the next frame is due and keeps statistics of how far
+each frame interval strayed from the target period.
+
+    tick: pygame.time.Clock.tick, which sleeps with millisecond granularity.
+    hybrid: sleeps until shortly before the frame is due, then spins on
+        perf_counter for the rest, so frames start on time without a core
+        spinning for the whole frame.
+    uncapped: does not wait at all.
+"""
+
+
+import collections
+import time
+
+import pygame
+
+from . import tools
+
+
+PACERS = ('tick', 'hybrid', 'uncapped')
+SPIN_MARGIN = 0.001
+JITTER_WINDOW = 600
+
+
+class Pacer:
+    """Prototype class for the frame pacers.
+
+    Attributes:
+        rate (float): Target frames per second. 0 means uncapped.
+        period (float): Target seconds per frame.
+        last (float): perf_counter seconds when the last wait ended.
+        intervals (obj): Seconds between the ends of the last waits.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.period = 1.0 / rate if rate else 0.0
+        self.last = None
+        self.intervals = collections.deque(maxlen=JITTER_WINDOW)
+
+    def pace(self):
+        """Waits until the next frame is due."""
+        pass
+
+    def resume(self):
+        """Starts a new schedule after the game loop was idle, leaving the idle time out of the statistics."""
+        self.last = None
+
+    def wait(self):
+        """Waits until the next frame is due and records the frame interval."""
+        self.pace()
+        now = time.perf_counter()
+        if self.last is not None:
+            self.intervals.append(now - self.last)
+        self.last = now
+
+    def stats(self):
+        """Summarizes the recent frame intervals.
+
+        Jitter is the absolute deviation of a frame interval from the
+        target period. When uncapped it is the deviation from the mean interval.
+
+        Returns:
+            stats (dict): Mean interval and the mean, p99 and max jitter, in milliseconds.
+        """
+        intervals = [interval * 1000.0 for interval in self.intervals]
+        if not intervals:
+            return {'frames': 0, 'interval_ms': 0.0, 'jitter_ms': 0.0, 'jitter_p99_ms': 0.0, 'jitter_max_ms': 0.0}
+        mean = sum(intervals) / len(intervals)
+        target = self.period * 1000.0 if self.period else mean
+        jitter = [abs(interval - target) for interval in intervals]
+        return {
+            'frames': len(intervals),
+            'interval_ms': mean,
+            'jitter_ms': sum(jitter) / len(jitter),
+            'jitter_p99_ms': tools.percentile(jitter, 99),
+            'jitter_max_ms': max(jitter)
+            }
+
+
+class TickPacer(Pacer):
+    """Paces with pygame.time.Clock.tick.
+
+    Attributes:
+        clock (obj): Pygame clock used to wait between frames.
+    """
+
+    def __init__(self, rate):
+        Pacer.__init__(self, rate)
+        self.clock = pygame.time.Clock()
+
+    def pace(self):
+        self.clock.tick(self.rate)
+
+
+class HybridPacer(Pacer):
+    """Sleeps until spin_margin before the frame is due, then spins until it is.
+
+    Frames are due at fixed deadlines, so a late frame does not push back
+    the ones after it. A frame more than a period late starts a new schedule.
+
+    Attributes:
+        spin_margin (float): Seconds before the deadline at which sleeping turns to spinning.
+        deadline (float): perf_counter seconds when the next frame is due.
+    """
+
+    def __init__(self, rate, spin_margin=SPIN_MARGIN):
+        Pacer.__init__(self, rate)
+        self.spin_margin = spin_margin
+        self.deadline = None
+
+    def pace(self):
+        now = time.perf_counter()
+        if self.deadline is None or now - self.deadline > self.period:
+            self.deadline = now + self.period
+        remaining = self.deadline - now
+        if remaining > self.spin_margin:
+            time.sleep(remaining - self.spin_margin)
+        while time.perf_counter() < self.deadline:
+            pass
+        self.deadline += self.period
+
+    def resume(self):
+        Pacer.resume(self)
+        self.deadline = None
+
+
+class UncappedPacer(Pacer):
+    """Runs frames as fast as possible."""
+
+    def __init__(self, rate=0):
+        Pacer.__init__(self, 0)
+
+
+def make_pacer(name, rate):
+    """Creates a pacer by name.
+
+    Args:
+        name (str): One of PACERS.
+        rate (float): Target frames per second. 0 means uncapped.
+
+    Returns:
+        pacer (obj): The pacer.
+    """
+    if name == 'uncapped' or not rate:
+        return UncappedPacer()
+    elif name == 'hybrid':
+        return HybridPacer(rate)
+    elif name == 'tick':
+        return TickPacer(rate)
+    raise ValueError('Unknown pacer: ' + str(name))
@@ -0,0 +1,81 @@
+"""Profiling
+
+This module captures cProfile profiles of a single game state. A capture
+is started with F4 or, on POSIX systems, by sending SIGUSR1 to the game.
+It stops after a number of frames or when the state changes, and is
+written to a .prof file named after the state, which can be read with
+pstats or snakeviz.
+"""
+
+
+import cProfile
+import logging
+import os
+import signal
+import time
+
+import pygame
+
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_KEY = pygame.K_F4
+PROFILE_EVENT = pygame.USEREVENT + 1
+PROFILE_DIR = 'profiles'
+PROFILE_FRAMES = 600
+
+
+def install_signal_handler():
+    """Posts a PROFILE_EVENT when the game receives SIGUSR1.
+
+    The handler only posts an event, so the capture starts on the main
+    thread at the next event loop. Does nothing where SIGUSR1 does not exist.
+    """
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: pygame.event.post(pygame.event.Event(PROFILE_EVENT)))
+
+
+class Capture:
+    """A cProfile capture of one game state.
+
+    Attributes:
+        state_name (str): The state being profiled.
+        frames_left (int): Frames to run before the capture stops.
+        directory (str): Directory the profile is written to.
+        profile (obj): The profiler.
+    """
+
+    def __init__(self, state_name, frames=PROFILE_FRAMES, directory=PROFILE_DIR):
+        self.state_name = state_name
+        self.frames_left = frames
+        self.directory = directory
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        """Starts profiling."""
+        logger.info('Profiling %s for up to %d frames', self.state_name, self.frames_left)
+        self.profile.enable()
+
+    def frame(self):
+        """Counts a finished frame.
+
+        Returns:
+            finished (bool): Whether the capture has run all its frames.
+        """
+        self.frames_left -= 1
+        return self.frames_left <= 0
+
+    def stop(self):
+        """Stops profiling and writes the profile.
+
+        Returns:
+            path (str): Path of the written profile.
+        """
+        self.profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        filename = '{}-{}.prof'.format(self.state_name, time.strftime('%Y%m%d-%H%M%S'))
+        path = os.path.join(self.directory, filename)
+        self.profile.dump_stats(path)
+        logger.info('Wrote profile of %s to %s', self.state_name, path)
+        return path
@@ -0,0 +1,225 @@
+"""Replay
+
+This module records the key input of a game session into a compact
+binary log, and plays a log back through the state controller.
+
+A log is a header followed by one record per frame. Each frame stores
+the milliseconds since the previous frame, shifted left by one bit with
+the low bit set when the frame has key events, followed by the number
+of key events and each key shifted left by one bit with the low bit set
+for KEYUP. All numbers are unsigned LEB128 varints.
+"""
+
+
+import struct
+
+import pygame
+
+
+MAGIC = b'SBREPLAY'
+VERSION = 1
+HEADER = struct.Struct('<8sBQq')
+
+
+def write_varint(data, value):
+    """Appends an unsigned varint to a byte array.
+
+    Args:
+        data (bytearray): The bytes to append to.
+        value (int): The number to write.
+    """
+    while value >= 0x80:
+        data.append(value & 0x7f | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def read_varint(data, pos):
+    """Reads an unsigned varint.
+
+    Args:
+        data (bytes): The bytes to read from.
+        pos (int): Offset of the varint.
+
+    Returns:
+        varint (tup): The number and the offset after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Recorder:
+    """Records the frame times and key events of a session.
+
+    Attributes:
+        seed (int): Seed of the session.
+        start_ticks (int): Clock ticks of the first recorded frame.
+        last_ticks (int): Clock ticks of the last recorded frame.
+        frames (int): Number of recorded frames.
+        data (bytearray): The encoded frames.
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.start_ticks = None
+        self.last_ticks = None
+        self.frames = 0
+        self.data = bytearray()
+
+    def record_frame(self, ticks, events):
+        """Records one frame.
+
+        Args:
+            ticks (int): Clock ticks of the frame.
+            events (list): Events of the frame. Only KEYDOWN and KEYUP events are kept.
+        """
+        if self.start_ticks is None:
+            self.start_ticks = ticks
+            self.last_ticks = ticks
+        keys = [event for event in events if event.type == pygame.KEYDOWN or event.type == pygame.KEYUP]
+        write_varint(self.data, (ticks - self.last_ticks) << 1 | bool(keys))
+        if keys:
+            write_varint(self.data, len(keys))
+            for event in keys:
+                write_varint(self.data, event.key << 1 | (event.type == pygame.KEYUP))
+        self.last_ticks = ticks
+        self.frames += 1
+
+    def save(self, path):
+        """Writes the log to a file.
+
+        Args:
+            path (str): Path of the log file.
+        """
+        start_ticks = self.start_ticks if self.start_ticks is not None else 0
+        with open(path, 'wb') as log_file:
+            log_file.write(HEADER.pack(MAGIC, VERSION, self.seed, start_ticks))
+            log_file.write(self.data)
+
+
+class Replay:
+    """Reads the frames of a replay log.
+
+    Attributes:
+        seed (int): Seed of the recorded session.
+        ticks (int): Clock ticks of the last frame read.
+        data (bytes): The encoded frames.
+        pos (int): Offset of the next frame.
+    """
+
+    def __init__(self, data):
+        magic, version, self.seed, self.ticks = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a version {} replay log'.format(VERSION))
+        self.data = data
+        self.pos = HEADER.size
+
+    @classmethod
+    def load(cls, path):
+        """Reads a replay log from a file.
+
+        Args:
+            path (str): Path of the log file.
+
+        Returns:
+            replay (obj): The replay.
+        """
+        with open(path, 'rb') as log_file:
+            return cls(log_file.read())
+
+    def next_frame(self):
+        """Reads the next frame.
+
+        Returns:
+            frame (tup): Clock ticks and key events of the frame, or None at the end of the log.
+        """
+        if self.pos >= len(self.data):
+            return None
+        value, self.pos = read_varint(self.data, self.pos)
+        self.ticks += value >> 1
+        events = []
+        if value & 1:
+            count, self.pos = read_varint(self.data, self.pos)
+            for i in range(count):
+                value, self.pos = read_varint(self.data, self.pos)
+                event_type = pygame.KEYUP if value & 1 else pygame.KEYDOWN
+                events.append(pygame.event.Event(event_type, key=value >> 1, mod=0))
+        return self.ticks, events
+
+
+class ReplayClock:
+    """Clock that plays back the frame times of a replay log.
+
+    Until it is started it runs on real time, or on a fixed step for an
+    uncapped replay, so the loading screen can take as long as it needs
+    without shifting the recorded frames.
+
+    Attributes:
+        clock (obj): Pygame clock used to wait between frames.
+        replay (obj): The replay being played back.
+        step (float): Milliseconds an uncapped frame advances before the recorded frames start,
+            or None to use real time.
+        started (bool): Whether recorded frames are being played back.
+        finished (bool): Whether the end of the log was reached.
+        ticks (int): Clock ticks of the current frame.
+        events (list): Key events of the current frame.
+    """
+
+    def __init__(self, replay, step=None):
+        self.clock = pygame.time.Clock()
+        self.replay = replay
+        self.step = step
+        self.started = False
+        self.finished = False
+        self.ticks = 0
+        self.events = []
+
+    def start(self):
+        """Starts playing back the recorded frames."""
+        self.started = True
+        self.ticks = self.replay.ticks
+
+    def tick(self, fps):
+        """Waits for the next frame, if capped, and reads it from the log.
+
+        Args:
+            fps (int): Frame rate cap. 0 means uncapped.
+
+        Returns:
+            dt (int): Milliseconds since the last frame.
+        """
+        if not self.started:
+            dt = self.step if self.step is not None and not fps else self.clock.tick(fps)
+            self.ticks += dt
+            return dt
+        if fps:
+            self.clock.tick(fps)
+        frame = self.replay.next_frame()
+        if frame is None:
+            self.finished = True
+            self.events = []
+            return 0
+        dt = frame[0] - self.ticks
+        self.ticks, self.events = frame
+        return dt
+
+    def get_ticks(self):
+        """Returns the clock ticks of the current frame."""
+        return self.ticks
+
+    def take_events(self):
+        """Returns the key events of the current frame, once.
+
+        Returns:
+            events (list): The key events.
+        """
+        events = self.events
+        self.events = []
+        return events
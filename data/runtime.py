@@ -0,0 +1,53 @@
+"""Runtime
+
+This module initializes the pygame modules on first use, and counts
+the loads that are done on the main thread.
+"""
+
+
+import logging
+import threading
+import time
+
+import pygame
+
+
+logger = logging.getLogger(__name__)
+
+
+# seconds taken by the pygame modules initialized on first use
+init_times = {}
+init_lock = threading.Lock()
+
+# decodes, file reads, and scales done on the main thread
+load_stats = {'foreground': 0}
+
+
+def init_module(name):
+    """Initializes a pygame module the first time it is needed, and times it.
+
+    SDL subsystems are not safe to initialize from more than one thread,
+    so a module can only be initialized on the main thread.
+
+    Args:
+        name (str): Name of the module, 'font' or 'mixer'.
+
+    Raises:
+        RuntimeError: If the module is not initialized yet and this is not the main thread.
+    """
+    module = getattr(pygame, name)
+    with init_lock:
+        if module.get_init():
+            return
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError('pygame.{} has to be initialized on the main thread'.format(name))
+        start = time.perf_counter()
+        module.init()
+        init_times[name] = time.perf_counter() - start
+        logger.info('Initialized %s in %.1fms', name, init_times[name] * 1000)
+
+
+def count_load():
+    """Counts a decode, file read, or scale if it is done on the main thread, where it holds up a frame."""
+    if threading.current_thread() is threading.main_thread():
+        load_stats['foreground'] += 1
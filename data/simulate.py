@@ -0,0 +1,211 @@
+"""Simulate
+
+This module estimates the difficulty curve by simulating whole games
+with the rules of the game: the task timers of State.timer_check, the
+milestone tasks and winning score of Taskdone.score_check, and the
+compiled transition table of each task, which is finished once its count
+reaches state_machine.TASK_COUNT, as State.count_check checks it.
+
+Players are modeled as distributions. Each task starts with a reaction
+time drawn from a log-normal distribution, followed by the fewest key
+events that finish the task, each taking a gamma distributed interval
+whose mean depends on the key pattern. Every simulated player also has
+a speed factor drawn once per game. A sum of gamma intervals is itself
+gamma distributed, so a whole task takes one draw.
+
+All games advance one score at a time as NumPy arrays, so millions of
+games take seconds. Requires NumPy.
+
+Usage:
+    python -m data.simulate [--games N] [--seed N] [--reaction S] [--interval S] [--json PATH]
+"""
+
+
+import argparse
+import collections
+import json
+import sys
+
+import numpy as np
+import pygame
+
+from . import state_machine
+from . import states
+from . import tasks
+
+
+# seconds, and how they vary
+PLAYER = {
+    'reaction': 0.45,
+    'reaction_sigma': 0.35,
+    'interval': {
+        'press_release': 0.11,
+        'alternate': 0.14,
+        'sequence': 0.2
+        },
+    'interval_cv': 0.5,
+    'skill_sigma': 0.15
+    }
+
+
+def task_events(task):
+    """Finds the fewest key events that finish a task.
+
+    Searches the compiled transition table of the task for the shortest
+    path to a node whose count reaches state_machine.TASK_COUNT. A key can
+    only be released after it was pressed, as on a real keyboard.
+
+    Args:
+        task (dict): The task description.
+
+    Returns:
+        events (int): Number of key events.
+    """
+    table, counts = tasks.compile_task(task)
+    keys = tasks.task_keys(task)
+    start = (0, frozenset())
+    depth = {start: 0}
+    pending = collections.deque([start])
+    while pending:
+        node, held = pending.popleft()
+        if counts[node] >= state_machine.TASK_COUNT:
+            return depth[(node, held)]
+        for key in keys:
+            if key in held:
+                event_type, next_held = pygame.KEYUP, held - {key}
+            else:
+                event_type, next_held = pygame.KEYDOWN, held | {key}
+            next_node = table.get((event_type, key, node), (node, None))[0]
+            if (next_node, next_held) not in depth:
+                depth[(next_node, next_held)] = depth[(node, held)] + 1
+                pending.append((next_node, next_held))
+    raise ValueError('Task cannot be finished')
+
+
+def time_limits():
+    """Returns the seconds the timer starts at for each score, from State.timer_check."""
+    rules = state_machine.State()
+    return np.array([rules.timer_check(score) for score in range(states.WIN_SCORE)])
+
+
+def simulate(games=1000000, player=PLAYER, seed=None):
+    """Simulates games and counts how many reach each score.
+
+    A task is finished in time if the timer, rounded to a tenth of a
+    second as the game does, is still above 0 on the frame that finishes it.
+
+    Args:
+        games (int): Number of games to simulate.
+        player (dict): The player model, see PLAYER.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        reached (obj): Number of games that reached each score from 0 to states.WIN_SCORE.
+    """
+    rng = np.random.default_rng(seed)
+    limits = time_limits()
+    names = list(state_machine.State.task_list)
+    events = {name: task_events(task) for name, task in tasks.TASKS.items()}
+    intervals = {name: player['interval'][task['pattern']] for name, task in tasks.TASKS.items()}
+    random_events = np.array([events[name] for name in names])
+    random_intervals = np.array([intervals[name] for name in names])
+    shape_per_event = 1.0 / player['interval_cv'] ** 2
+    reaction_mu = np.log(player['reaction']) - player['reaction_sigma'] ** 2 / 2
+    skill = rng.lognormal(-player['skill_sigma'] ** 2 / 2, player['skill_sigma'], games)
+    reached = np.zeros(states.WIN_SCORE + 1, dtype=np.int64)
+    reached[0] = games
+    for score in range(states.WIN_SCORE):
+        alive = len(skill)
+        if not alive:
+            break
+        if score in states.MILESTONE_TASKS:
+            name = states.MILESTONE_TASKS[score]
+            task_events_count = np.full(alive, events[name])
+            interval = np.full(alive, intervals[name])
+        else:
+            choice = rng.integers(len(names), size=alive)
+            task_events_count = random_events[choice]
+            interval = random_intervals[choice]
+        reaction = rng.lognormal(reaction_mu, player['reaction_sigma'], alive)
+        keys = rng.gamma(task_events_count * shape_per_event, interval / shape_per_event)
+        finish = (reaction + keys) * skill
+        finish = np.ceil(finish * state_machine.FPS) / state_machine.FPS
+        skill = skill[np.round(limits[score] - finish, 1) > 0]
+        reached[score + 1] = len(skill)
+    return reached
+
+
+def summarize(reached):
+    """Turns the games reaching each score into survival and win probabilities.
+
+    Score bands are the ranges of scores that share a timer.
+
+    Args:
+        reached (obj): Number of games that reached each score.
+
+    Returns:
+        summary (dict): Survival curve, win probability, and the chance of
+            getting through each score band once it is reached.
+    """
+    games = reached[0]
+    limits = time_limits()
+    bands = []
+    start = 0
+    for score in range(1, states.WIN_SCORE + 1):
+        if score == states.WIN_SCORE or limits[score] != limits[start]:
+            bands.append({
+                'scores': [start, score - 1],
+                'timer': float(limits[start]),
+                'reached': float(reached[start] / games),
+                'survival': float(reached[score] / reached[start]) if reached[start] else 0.0
+                })
+            start = score
+    return {
+        'games': int(games),
+        'survival': [float(count / games) for count in reached],
+        'win_probability': float(reached[-1] / games),
+        'bands': bands
+        }
+
+
+def parse_args(argv):
+    """Parse the command line options of the simulator.
+
+    Args:
+        argv (list): Command line arguments, without the program name.
+
+    Returns:
+        args (obj): The parsed options.
+    """
+    parser = argparse.ArgumentParser(description='Simulate games to estimate the difficulty curve.')
+    parser.add_argument('--games', type=int, default=1000000, help='number of games to simulate')
+    parser.add_argument('--seed', type=int, help='seed of the random number generator')
+    parser.add_argument('--reaction', type=float, default=PLAYER['reaction'], help='mean reaction time in seconds')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='scale of the mean time between key events, 1 for the default player')
+    parser.add_argument('--json', help='write the summary to a JSON file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Runs the simulator from the command line.
+
+    Args:
+        argv (list): Command line arguments, without the program name. Defaults to sys.argv.
+    """
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    player = dict(PLAYER)
+    player['reaction'] = args.reaction
+    player['interval'] = {pattern: mean * args.interval for pattern, mean in PLAYER['interval'].items()}
+    summary = summarize(simulate(args.games, player, args.seed))
+    for band in summary['bands']:
+        print('scores {:>2}-{:<2}  timer {:.1f}s  reached {:6.2%}  survived {:6.2%}'.format(
+            band['scores'][0], band['scores'][1], band['timer'], band['reached'], band['survival']))
+    print('win probability {:.4%}'.format(summary['win_probability']))
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(summary, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
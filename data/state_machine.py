@@ -4,84 +4,557 @@ This module contains the game state controller and prototype state class.
 """
 
 
+import logging
+import random
+import time
+
 import pygame
 
+from . import latency
+from . import loader
+from . import overlay
+from . import pacing
+from . import profiling
+from . import replay
+from . import runtime
 from . import tools
 
 
+logger = logging.getLogger(__name__)
+
+
 TITLE = 'Stick Bop!'
 WINDOW_SIZE = (1000, 800)
 WINDOW_WIDTH = 1000
 WINDOW_HEIGHT = 800
+# screen size when images are not rendered
+NO_RENDER_SIZE = (1, 1)
 FPS = 60
+# milliseconds of prefetch work done on the main thread each frame
+PREFETCH_BUDGET = 4.0
+# task count that completes a task
+TASK_COUNT = 5
+# music played from each score milestone
+MUSIC_TRACKS = {
+    0: 'neon-runner',
+    25: 'neon-runner-x125',
+    50: 'neon-runner-x150',
+    75: 'neon-runner-x175'
+    }
+
+
+class Clock:
+    """Real time clock that caps the frame rate.
+
+    Ticks are counted with perf_counter, since pygame.time.get_ticks
+    reads 0 until pygame.init starts the timer.
+
+    Attributes:
+        clock (obj): Pygame clock used to wait between frames.
+        created (float): perf_counter seconds when the clock was created.
+    """
+
+    def __init__(self):
+        self.clock = pygame.time.Clock()
+        self.created = time.perf_counter()
+
+    def tick(self, fps):
+        """Waits for the next frame.
+
+        Args:
+            fps (int): Frame rate cap. 0 means uncapped.
+
+        Returns:
+            dt (int): Milliseconds since the last frame.
+        """
+        return self.clock.tick(fps)
+
+    def get_ticks(self):
+        """Returns milliseconds since the clock was created."""
+        return int((time.perf_counter() - self.created) * 1000)
+
+
+class FixedStepClock(Clock):
+    """Clock that advances by a fixed step every frame, however long the frame took.
+
+    Runs give the same timers at any speed, uncapped or not.
+
+    Attributes:
+        step (float): Simulated milliseconds per frame.
+        ticks (float): Simulated milliseconds since the clock was created.
+    """
+
+    def __init__(self, step=1000 / FPS):
+        Clock.__init__(self)
+        self.step = step
+        self.ticks = 0.0
+
+    def tick(self, fps):
+        """Waits for the next frame, if capped, and advances by one step.
+
+        Args:
+            fps (int): Frame rate cap. 0 means uncapped.
+
+        Returns:
+            dt (float): Simulated milliseconds since the last frame.
+        """
+        if fps:
+            self.clock.tick(fps)
+        self.ticks += self.step
+        return self.step
+
+    def get_ticks(self):
+        """Returns simulated milliseconds since the clock was created."""
+        return int(self.ticks)
+
+
+class ScaledClock(Clock):
+    """Real time clock that runs faster or slower than the wall clock.
+
+    Attributes:
+        scale (float): Game milliseconds per real millisecond.
+    """
+
+    def __init__(self, scale):
+        Clock.__init__(self)
+        self.scale = scale
+
+    def tick(self, fps):
+        """Waits for the next frame.
+
+        Args:
+            fps (int): Frame rate cap. 0 means uncapped.
+
+        Returns:
+            dt (float): Scaled milliseconds since the last frame.
+        """
+        return self.clock.tick(fps) * self.scale
+
+    def get_ticks(self):
+        """Returns scaled milliseconds since the clock was created."""
+        return int(Clock.get_ticks(self) * self.scale)
+
+
+CLOCKS = ('real', 'fixed', 'scaled')
 
 
 class StateController:
     """Controls and sets up the game settings, game states, and main game loop.
 
     Attributes:
+        resizable (bool): Lets the window be resized.
+        fullscreen (bool): Runs the game at the size of the display. Toggled with F11.
+        scale_quality (str): How images are scaled to the window, one of tools.SCALE_QUALITIES.
+        fast_forward (bool): Runs uncapped on a fixed step clock instead of the wall clock.
+        render (bool): Decodes and draws the images. If False, every image is a blank placeholder
+            on a 1x1 screen, so only the state transitions run, such as for a fast replay.
+        pacing (str): The frame pacer, one of pacing.PACERS.
+        target_fps (float): Frame rate the pacer aims for.
+        clock_mode (str): The clock used for game time, one of CLOCKS.
+        time_scale (float): Speed of game time for the 'scaled' clock.
+        seed (int): Seed of the random number generator. Picked at random if None.
+        record_path (str): Records the key input of the session to this replay log.
+        replay_path (str): Plays back the key input and frame times of this replay log.
+        max_frames (int): Stops the game loop after this many frames. None runs until quit.
+        show_overlay (bool): Shows the frame-time overlay from the start. F3 toggles it.
+        profile_frames (int): Frames a profiler capture runs before it stops on its own.
+        profile_dir (str): Directory profiler captures are written to.
+        latency_path (str): Measures input-to-display latency and writes it to this JSON file.
+        launch_time (float): perf_counter seconds when the game was launched. The time to the first frame is reported if set.
+        startup_phases (dict): Seconds taken by each startup phase before the game loop, reported with the first frame.
         done (bool): State completion status.
         screen (obj): Initializes display surface.
         caption (obj): Sets the window title.
         clock (obj): Initializes clock object to help track time.
-        states (dict): The various game states.
+        pacer (obj): Waits for the next frame and keeps jitter statistics.
+        rng (obj): Random number generator of the session.
+        replay_clock (obj): Clock playing back the replay log, if any.
+        recorder (obj): Recorder of the key input, if any.
+        playing (bool): Whether the start state has been left. Input is recorded and replayed from then on.
+        states (dict): The game states that have been created.
+        factories (dict): Creates each game state the first time it is entered.
+        frame_count (int): Frames run by the game loop.
+        first_frame_time (float): Seconds from launch to the first frame on the screen, once reported.
+        interactive_time (float): Seconds from launch to the first frame after the start state, once reported.
+        prefetching (tup): Name, start time, and remaining steps of the state being prefetched, if any.
+        prefetched (str): Name of the state that was prefetched and not entered yet.
+        entered (tup): Flip start time, foreground loads at the flip, and whether the state was prefetched,
+            until the first frame of the state is on the screen.
+        entry_stats (dict): State names mapped to their entries, prefetched entries, prefetch hits,
+            and milliseconds to the first frame of each entry.
+        frame_overlay (obj): The frame-time overlay.
+        capture (obj): The running profiler capture, if any. Started with F4 or SIGUSR1.
+        latency (obj): Tracker of input-to-display latency, if measured.
+        last_poll (float): perf_counter seconds when the event queue was last polled.
     """
 
     def __init__(self, **settings):
+        self.resizable = True
+        self.fullscreen = False
+        self.scale_quality = tools.scale_quality
+        self.fast_forward = False
+        self.render = True
+        self.pacing = 'tick'
+        self.target_fps = FPS
+        self.clock_mode = 'real'
+        self.time_scale = 1.0
+        self.seed = None
+        self.record_path = None
+        self.replay_path = None
+        self.max_frames = None
+        self.show_overlay = overlay.overlay_enabled()
+        self.profile_frames = profiling.PROFILE_FRAMES
+        self.profile_dir = profiling.PROFILE_DIR
+        self.latency_path = None
+        self.launch_time = None
+        self.startup_phases = {}
         self.__dict__.update(settings)
         self.done = False
-        self.screen = pygame.display.set_mode(WINDOW_SIZE)
+        self.states = {}
+        self.factories = {}
+        self.frame_count = 0
+        self.first_frame_time = None
+        self.interactive_time = None
+        self.prefetching = None
+        self.prefetched = None
+        self.entered = None
+        self.entry_stats = {}
+        tools.scale_quality = self.scale_quality
+        tools.images.placeholders = not self.render
+        self.screen = self.set_display(WINDOW_SIZE)
         tools.change_icon('helmet-icon.png')
         self.caption = pygame.display.set_caption(TITLE)
-        self.clock = pygame.time.Clock()
-        self.states = {}
+        self.replay_clock = None
+        if self.replay_path is not None:
+            log = replay.Replay.load(self.replay_path)
+            self.seed = log.seed
+            step = 1000 / FPS if self.fast_forward else None
+            self.clock = self.replay_clock = replay.ReplayClock(log, step)
+        elif self.fast_forward or self.clock_mode == 'fixed':
+            self.clock = FixedStepClock()
+        elif self.clock_mode == 'scaled':
+            self.clock = ScaledClock(self.time_scale)
+        elif self.clock_mode == 'real':
+            self.clock = Clock()
+        else:
+            raise ValueError('Unknown clock: ' + str(self.clock_mode))
+        self.fps = 0 if self.fast_forward else self.target_fps
+        self.pacer = pacing.make_pacer(self.pacing, self.fps)
+        if self.seed is None:
+            self.seed = random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        logger.info('Session seed: %d', self.seed)
+        self.recorder = replay.Recorder(self.seed) if self.record_path is not None else None
+        self.playing = False
+        self.frame_overlay = overlay.FrameOverlay(budget=1000.0 / (self.fps or FPS), visible=self.show_overlay)
+        self.capture = None
+        profiling.install_signal_handler()
+        self.latency = latency.LatencyTracker() if self.latency_path is not None else None
+        self.last_poll = time.perf_counter()
+
+    def set_display(self, size):
+        """Sets the display mode and fits the states to the new screen size.
+
+        Scaled images of the previous size are dropped.
+
+        Args:
+            size (tup): The width and height of the window.
+
+        Returns:
+            screen (obj): The display surface.
+        """
+        if not self.render:
+            screen = pygame.display.set_mode(NO_RENDER_SIZE)
+        elif self.fullscreen:
+            screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            screen = pygame.display.set_mode(size, pygame.RESIZABLE if self.resizable else 0)
+        tools.clear_scaled_images()
+        for state in self.states.values():
+            state.resize(screen.get_size())
+            state.invalidate()
+        return screen
 
     def setup_states(self, state_dict, start_state):
         """Sets the initial state.
 
+        Only the initial state is created here. The others are created by
+        their factories the first time they are entered.
+
         Args:
-            state_dict (dict): Holds a list of all states and their respective class instances.
+            state_dict (dict): Maps state names to a state instance or a factory that creates it.
             start_state (str): The name of the first state to be used.
         """
-        self.states = state_dict
+        self.states = {}
+        self.factories = {}
+        for name, state in state_dict.items():
+            if isinstance(state, State):
+                self.add_state(name, state)
+            else:
+                self.factories[name] = state
         self.state_name = start_state
-        self.state = self.states[self.state_name]
+        self.state = self.get_state(self.state_name)
+        self.state.startup()
+
+    def add_state(self, name, state):
+        """Hands the controller clock, random number generator and screen size to a state.
+
+        Args:
+            name (str): The name of the state.
+            state (obj): The state.
+        """
+        state.clock = self.clock
+        state.rng = self.rng
+        state.resize(self.screen.get_size())
+        self.states[name] = state
+
+    def get_state(self, name):
+        """Gets a state, creating it with its factory on first use.
+
+        Args:
+            name (str): The name of the state.
+
+        Returns:
+            state (obj): The state.
+        """
+        state = self.states.get(name)
+        if state is None:
+            start = time.perf_counter()
+            state = self.factories[name]()
+            self.add_state(name, state)
+            logger.debug('Created state %s in %.1fms', name, (time.perf_counter() - start) * 1000)
+        return state
 
     def flip_state(self):
-        """Flips to the next state."""
+        """Flips to the next state. A running profiler capture ends with its state."""
+        if self.capture is not None:
+            self.stop_capture()
+        if not self.playing:
+            self.playing = True
+            if self.replay_clock is not None:
+                self.replay_clock.start()
+        flip_start = time.perf_counter()
+        loads = runtime.load_stats['foreground']
         self.state.done = False
         current = self.state_name
         self.state_name = self.state.next
-        self.state = self.states[self.state_name]
+        self.state = self.get_state(self.state_name)
+        if self.prefetching is not None:
+            logger.debug('Entered %s before the prefetch of %s finished', self.state_name, self.prefetching[0])
+            self.prefetching[2].close()
+            self.prefetching = None
+        if tools.asset_loader is not None and not tools.asset_loader.done:
+            tools.asset_loader.set_streaming(self.state.streaming)
+        self.state.invalidate()
         self.state.startup()
         self.state.current = current
+        self.entered = (flip_start, loads, self.prefetched == self.state_name)
+        self.prefetched = None
+
+    def prefetch(self, name):
+        """Starts having a state load its assets before it is entered.
+
+        The images of the state are decoded on the prefetcher thread, which
+        is started on first use. The rest of the loading is done on the main
+        thread a few steps each frame by step_prefetch. A state entered
+        before its prefetch finishes loads the rest itself.
+
+        Args:
+            name (str): The name of the state.
+        """
+        if tools.prefetcher is None:
+            tools.prefetcher = loader.ImagePrefetcher(tools.images)
+            tools.prefetcher.start()
+        self.prefetching = (name, time.perf_counter(), self.get_state(name).prefetch(self.screen))
+
+    def step_prefetch(self):
+        """Advances the running prefetch until PREFETCH_BUDGET is spent or it waits on the prefetcher thread."""
+        name, start, steps = self.prefetching
+        deadline = time.perf_counter() + PREFETCH_BUDGET / 1000
+        for working in steps:
+            if not working or time.perf_counter() >= deadline:
+                return
+        self.prefetching = None
+        self.prefetched = name
+        logger.debug('Prefetched %s in %.1fms', name, (time.perf_counter() - start) * 1000)
+
+    def record_entry(self):
+        """Records the time to the first frame of the state just entered, and whether its prefetch covered it.
+
+        A prefetch hit is an entry whose startup and first update did no
+        decoding, file reads, or scaling on the main thread. Once the first
+        frame is on the screen, the prefetch of the next state is started if the state allows it.
+        """
+        flip_start, loads, prefetched = self.entered
+        self.entered = None
+        stats = self.entry_stats.setdefault(
+            self.state_name, {'entries': 0, 'prefetched': 0, 'hits': 0, 'first_frame_ms': []})
+        stats['entries'] += 1
+        stats['first_frame_ms'].append((time.perf_counter() - flip_start) * 1000)
+        if prefetched:
+            stats['prefetched'] += 1
+            if runtime.load_stats['foreground'] == loads:
+                stats['hits'] += 1
+        if self.state.prefetch_next and self.state.next is not None:
+            self.prefetch(self.state.next)
+
+    def report_entries(self):
+        """Logs the prefetch hit rate and the time to the first frame of each state."""
+        for name, stats in sorted(self.entry_stats.items()):
+            hit_rate = stats['hits'] / stats['prefetched'] * 100 if stats['prefetched'] else 0.0
+            logger.info('%-13s %4d entries  prefetch hits %3.0f%% of %d  first frame p50 %.1fms  p95 %.1fms',
+                        name, stats['entries'], hit_rate, stats['prefetched'],
+                        tools.percentile(stats['first_frame_ms'], 50), tools.percentile(stats['first_frame_ms'], 95))
 
     def update(self, dt):
         """Checks for state flip and updates current state.
 
         Args:
             dt (int): Milliseconds since last frame.
+
+        Returns:
+            dirty_rects (list): Areas of the screen that changed, or None if the whole screen has to be updated.
         """
+        flipped = False
         if self.state.quit:
             self.done = True
         elif self.state.done:
             self.flip_state()
-        self.state.update(self.screen, dt)
+            flipped = True
+        dirty_rects = self.state.update(self.screen, dt)
+        if flipped:
+            return None
+        return dirty_rects
 
     def event_loop(self):
-        """Events are passed for handling the current state."""
-        for event in pygame.event.get():
+        """Events are passed for handling the current state.
+
+        When replaying, the key events come from the replay log instead of the keyboard.
+        """
+        events = pygame.event.get()
+        polled = time.perf_counter()
+        if self.replay_clock is not None and self.replay_clock.started:
+            events = [event for event in events if event.type != pygame.KEYDOWN and event.type != pygame.KEYUP]
+            events += self.replay_clock.take_events()
+            if self.replay_clock.finished:
+                self.done = True
+        if self.recorder is not None and self.playing:
+            self.recorder.record_frame(self.clock.get_ticks(), events)
+        if self.latency is not None:
+            self.state.event_time = (self.last_poll, polled)
+        self.last_poll = polled
+        for event in events:
             if event.type == pygame.QUIT:
                 self.done = True
+            elif event.type == pygame.VIDEOEXPOSE:
+                self.state.invalidate()
+            elif event.type == pygame.VIDEORESIZE and not self.fullscreen:
+                self.screen = self.set_display(event.size)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                self.fullscreen = not self.fullscreen
+                self.screen = self.set_display(WINDOW_SIZE)
+            elif event.type == pygame.KEYDOWN and event.key == overlay.OVERLAY_KEY:
+                self.frame_overlay.toggle()
+                self.state.invalidate()
+            elif event.type == profiling.PROFILE_EVENT or (event.type == pygame.KEYDOWN and event.key == profiling.PROFILE_KEY):
+                self.toggle_capture()
             self.state.get_event(event)
 
+    def toggle_capture(self):
+        """Starts a profiler capture of the current state, or stops the running one."""
+        if self.capture is not None:
+            self.stop_capture()
+        else:
+            self.capture = profiling.Capture(self.state_name, self.profile_frames, self.profile_dir)
+            self.capture.start()
+
+    def stop_capture(self):
+        """Stops the running profiler capture and writes its profile."""
+        self.capture.stop()
+        self.capture = None
+
+    def report_startup(self):
+        """Logs the startup phases and the time from launch to the first frame on the screen."""
+        phases = list(self.startup_phases.items()) + sorted(runtime.init_times.items())
+        for phase, seconds in phases:
+            logger.info('Startup %-12s %7.1fms', phase, seconds * 1000)
+        self.first_frame_time = time.perf_counter() - self.launch_time
+        logger.info('First frame %.1fms after launch', self.first_frame_time * 1000)
+
+    def idle_wait(self):
+        """Blocks until an event arrives.
+
+        The event that ends the wait is put back on the queue for the event loop.
+        """
+        pygame.event.post(pygame.event.wait())
+
     def game_loop(self):
-        """This is the main game loop."""
+        """This is the main game loop.
+
+        When an idle state has nothing left to draw and no prefetch is
+        running, the loop sleeps on the event queue instead of ticking until
+        input arrives. While the overlay
+        is shown, each phase of the loop is timed and the overlay is drawn on
+        top of the state.
+        """
+        idle = False
         while not self.done:
-            delta_time = self.clock.tick(FPS) / 1000.0
+            if idle and not self.fast_forward and self.replay_clock is None:
+                self.idle_wait()
+                self.pacer.resume()
+            tick_start = time.perf_counter()
+            self.pacer.wait()
+            delta_time = self.clock.tick(0) / 1000.0
+            events_start = time.perf_counter()
             self.event_loop()
-            self.update(delta_time)
-            pygame.display.update()
+            update_start = time.perf_counter()
+            dirty_rects = self.update(delta_time)
+            display_start = time.perf_counter()
+            if self.frame_overlay.visible:
+                overlay_rect = self.frame_overlay.draw(self.screen)
+                if dirty_rects is not None:
+                    dirty_rects.append(overlay_rect)
+            if dirty_rects is None:
+                pygame.display.update()
+            elif dirty_rects:
+                pygame.display.update(dirty_rects)
+            if self.latency is not None and self.state.input_time is not None:
+                self.latency.record(self.state_name, self.state.input_time, time.perf_counter())
+                self.state.input_time = None
+            if self.frame_overlay.visible:
+                display_end = time.perf_counter()
+                self.frame_overlay.record(
+                    self.state_name,
+                    (events_start - tick_start) * 1000.0,
+                    (update_start - events_start) * 1000.0,
+                    (display_start - update_start) * 1000.0,
+                    (display_end - display_start) * 1000.0)
+            if self.entered is not None:
+                self.record_entry()
+            if self.prefetching is not None:
+                self.step_prefetch()
+            idle = self.state.idle and dirty_rects == [] and self.prefetching is None
+            if self.frame_count == 0 and self.launch_time is not None:
+                self.report_startup()
+            elif self.playing and self.interactive_time is None and self.launch_time is not None:
+                self.interactive_time = time.perf_counter() - self.launch_time
+                logger.info('Interactive %s %.1fms after launch', self.state_name, self.interactive_time * 1000)
+            self.frame_count += 1
+            if self.capture is not None and self.capture.frame():
+                self.stop_capture()
+            if self.max_frames is not None and self.frame_count >= self.max_frames:
+                self.done = True
+        if self.capture is not None:
+            self.stop_capture()
+        if self.recorder is not None:
+            self.recorder.save(self.record_path)
+        if self.latency is not None:
+            self.latency.export(self.latency_path)
+        self.report_entries()
+        tools.sound_bank.report()
+        jitter = self.pacer.stats()
+        logger.info('Pacing %s: interval %.2fms, jitter mean %.3fms, p99 %.3fms, max %.3fms', self.pacing,
+                    jitter['interval_ms'], jitter['jitter_ms'], jitter['jitter_p99_ms'], jitter['jitter_max_ms'])
 
 
 class State:
@@ -98,6 +571,16 @@ class State:
         screen_size (tup): The width and height of the game screen.
         screen_width (int): The width of the game screen.
         screen_height (int): The height of the game screen.
+        clock (obj): The clock of the state controller, used for all state timers.
+        rng (obj): The random number generator of the state controller.
+        idle (bool): Lets the game loop wait for events once the state has nothing left to draw.
+        streaming (bool): Lets the asset loader stream assets in the background while the state runs.
+        prefetch_next (bool): Lets the controller prefetch the next state once this state is on the screen.
+        drawn_img (obj): The image currently on the screen.
+        hud_rects (list): Areas of the screen covered by the HUD in the last update.
+        event_time (tup): Times of the previous poll and of the poll that returned the events being handled,
+            set when latency is measured.
+        input_time (tup): event_time of the first key press whose result is not on the screen yet.
     """
     score = 0
     count = 0
@@ -118,21 +601,121 @@ class State:
         self.screen_size = WINDOW_SIZE
         self.screen_width = WINDOW_WIDTH
         self.screen_height = WINDOW_HEIGHT
+        self.clock = None
+        self.rng = None
+        self.idle = False
+        self.streaming = True
+        self.prefetch_next = False
+        self.drawn_img = None
+        self.hud_rects = []
+        self.event_time = None
+        self.input_time = None
+
+    def resize(self, size):
+        """Sets the size of the game screen.
+
+        Args:
+            size (tup): The width and height of the screen.
+        """
+        self.screen_size = tuple(size)
+        self.screen_width, self.screen_height = self.screen_size
+
+    def prefetch(self, screen):
+        """Loads the assets the state needs to start, so its startup and first update do no decoding or I/O.
+
+        The loading is done a step at a time as the returned iterator is
+        advanced. It yields True after each step of work on the main thread,
+        and False while it waits for images from the prefetcher thread.
+
+        Args:
+            screen (obj): The display surface, for scaling images to its size.
+
+        Returns:
+            steps (obj): Iterator over the steps of the loading.
+        """
+        return iter(())
+
+    def prefetched_image(self, name):
+        """Waits for the prefetcher thread to decode an image, as part of a prefetch.
+
+        Args:
+            name (str): Name of the image, requested from tools.prefetcher.
+
+        Yields:
+            working (bool): False until the image is resident.
+
+        Returns:
+            image (obj): The decoded image.
+        """
+        image = tools.images.peek(name)
+        while image is None:
+            yield False
+            image = tools.images.peek(name)
+        return image
+
+    def invalidate(self):
+        """Forces the next update to redraw the whole screen."""
+        self.drawn_img = None
+        self.hud_rects = []
+
+    def update_task(self, screen, image):
+        """Draws the task image and HUD, then checks for task completion / fail.
+
+        When the new image is a frame of the same task as the one on the screen,
+        only the changed regions of the frames and the previous HUD area are redrawn.
+
+        Args:
+            screen (obj): Surface to draw on.
+            image (obj): The current task image.
+
+        Returns:
+            dirty_rects (list): Areas of the screen that changed, or None if the whole screen changed.
+        """
+        if image is self.drawn_img or tools.shares_base(image, self.drawn_img):
+            dirty_rects = self.hud_rects
+            if image is not self.drawn_img:
+                dirty_rects = dirty_rects + image.draw_over(self.drawn_img, screen)
+            for rect in self.hud_rects:
+                tools.draw_image(image, screen, rect)
+        else:
+            self.draw(screen)
+            dirty_rects = None
+        self.drawn_img = image
+        time_elapsed = self.clock.get_ticks() - self.start_time
+        timer_seconds = float(time_elapsed / 1000 % 60)
+        timer = round(self.timer_start - timer_seconds, 1)
+        timer_text = 'Timer: ' + str(timer)
+        score_text = 'Score: ' + str(self.score)
+        self.hud_rects = [
+            tools.clear_hud_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen),
+            tools.render_hud_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen),
+            tools.clear_hud_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen),
+            tools.render_hud_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen),
+            tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count / TASK_COUNT * 100, screen)
+            ]
+        self.count_check(self.count, timer)
+        if dirty_rects is None:
+            return None
+        return dirty_rects + self.hud_rects
 
     def music_check(self, score):
         """Checks for when to speed up music.
 
+        The next faster track is prepared in the background so the
+        switch at the next milestone does not touch the disk.
+
         Args:
             score (int): Game score.
         """
+        if score not in MUSIC_TRACKS:
+            return
+        track = tools.sounds[MUSIC_TRACKS[score]]
         if score == 0:
-            tools.play_music(tools.sounds['neon-runner'])
-        elif score == 25:
-            tools.play_music(tools.sounds['neon-runner-x125'])
-        elif score == 50:
-            tools.play_music(tools.sounds['neon-runner-x150'])
-        elif score == 75:
-            tools.play_music(tools.sounds['neon-runner-x175'])
+            tools.play_music(track)
+        else:
+            tools.music.switch(track)
+        if score + 25 in MUSIC_TRACKS:
+            tools.music.prepare(tools.sounds[MUSIC_TRACKS[score + 25]])
 
     def count_check(self, count, timer):
         """Checks for task completion / fail.
@@ -141,7 +724,7 @@ class State:
             count (int): Represents the progress of task completion.
             timer (int): Rounded time in seconds elapsed since task started.
         """
-        if count >= 5 and timer > 0:
+        if count >= TASK_COUNT and timer > 0:
             State.score += 1
             tools.play_sound(tools.sounds['task-done'])
             self.next = 'taskdone'
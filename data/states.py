@@ -5,57 +5,105 @@ for use with the finite state machine.
 """
 
 
-import random
-import os
-
 import pygame
 
+from . import loader
+from . import runtime
 from . import state_machine
+from . import tasks
 from . import tools
 
 
+# tasks that replace the random task at a score, and the score that wins the game
+MILESTONE_TASKS = {
+    24: 'excalibur1',
+    49: 'excalibur2',
+    74: 'excalibur3',
+    99: 'excalibur4'
+    }
+WIN_SCORE = 100
+
+# assets grouped by the first state that needs them, in load order
+ASSET_TIERS = [
+    ('menu', ['stick-bop-menu'], ['insert-quarter']),
+    ('start', ['ready', 'set', 'go'], ['ready-set-go', 'task-done', 'neon-runner']),
+    ('tasks', [frame for name in state_machine.State.task_list for frame in tasks.frame_names(tasks.TASKS[name])], []),
+    ('excalibur1', tasks.frame_names(tasks.TASKS['excalibur1']), ['neon-runner-x125']),
+    ('excalibur2', tasks.frame_names(tasks.TASKS['excalibur2']), ['neon-runner-x150']),
+    ('excalibur3', tasks.frame_names(tasks.TASKS['excalibur3']), ['neon-runner-x175']),
+    ('excalibur4', tasks.frame_names(tasks.TASKS['excalibur4']), []),
+    ('end', ['game-over', 'winner'], ['piano-lofi-rain', 'future-grid'])
+    ]
+
+
 class Loading(state_machine.State):
-    """Displays loading image. Loads all assets including fonts, images, and sounds."""
+    """Displays loading image. Loads the assets of the menu, and starts streaming in the rest.
+
+    The game moves on to the menu as soon as its tier is loaded. The
+    other tiers keep loading in the background. The mixer is initialized
+    here, on the main thread, before the loader starts.
+    """
 
     def __init__(self):
         state_machine.State.__init__(self)
         self.next = 'menu'
         self.load = True
-        self.start_time = pygame.time.get_ticks()
-        self.load_img = pygame.image.load(os.path.join(tools.IMG_DIR, 'loading.png')).convert()
+        self.loader = None
+        self.load_img = None
 
     def load_assets(self):
-        if self.load:
-            tools.images = tools.load_images(tools.IMG_DIR)
-            tools.sounds = tools.load_sounds(tools.SND_DIR)
-            tools.fonts = tools.load_fonts(tools.FNT_DIR)
-            self.load = False
+        if self.load and self.loader is None:
+            runtime.init_module('mixer')
+            self.loader = loader.AssetLoader(ASSET_TIERS)
+            tools.asset_loader = self.loader
+            self.loader.start()
 
     def startup(self):
-        pass
+        if self.load_img is None:
+            self.load_img = tools.read_image('loading.png').convert()
+        self.start_time = self.clock.get_ticks()
 
     def get_event(self, event):
         pass
 
     def update(self, screen, dt):
         self.load_img = tools.render_image(self.load_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
+        if self.load_img is self.drawn_img:
+            dirty_rects = []
+        else:
+            self.draw(screen)
+            self.drawn_img = self.load_img
+            dirty_rects = None
+        time_elapsed = self.clock.get_ticks() - self.start_time
         if time_elapsed >= 200:
             self.load_assets()
+        if self.loader is not None:
+            bar_rect = tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.loader.progress(), screen)
+            if dirty_rects is not None:
+                dirty_rects.append(bar_rect)
+            if self.loader.error is not None:
+                raise self.loader.error
+            if self.loader.tier_ready(ASSET_TIERS[0][0]):
+                self.load = False
         if not self.load:
             self.done = True
+        return dirty_rects
 
     def draw(self, screen):
-        screen.blit(self.load_img, [0, 0])
+        tools.draw_image(self.load_img, screen)
 
 
 class Menu(state_machine.State):
-    """Displays main menu. Allows user to start or quit game."""
+    """Displays main menu. Allows user to start or quit game.
+
+    The controller prefetches the start state while the menu is shown.
+    """
 
     def __init__(self):
         state_machine.State.__init__(self)
         self.next = 'start'
+        self.idle = True
+        self.prefetch_next = True
 
     def startup(self):
         self.menu_img = tools.images['stick-bop-menu']
@@ -69,33 +117,49 @@ class Menu(state_machine.State):
 
     def update(self, screen, dt):
         self.menu_img = tools.render_image(self.menu_img, self.screen_size, screen)
+        if self.menu_img is self.drawn_img:
+            return []
         self.draw(screen)
+        self.drawn_img = self.menu_img
 
     def draw(self, screen):
-        screen.blit(self.menu_img, [0, 0])
+        tools.draw_image(self.menu_img, screen)
 
 
 class Start(state_machine.State):
-    """Displays ready, set, GO! message with sound and starts the game."""
+    """Displays ready, set, GO! message with sound and starts the game.
+
+    The controller prefetches the first task while the message is shown.
+    """
 
     def __init__(self):
         state_machine.State.__init__(self)
+        self.prefetch_next = True
 
     def startup(self):
         state_machine.State.score = 0
-        self.next = random.choice(self.task_list)
-        pygame.mixer.music.stop()
+        self.next = self.rng.choice(self.task_list)
+        tools.music.stop()
         tools.play_sound(tools.sounds['ready-set-go'])
-        self.start_time = pygame.time.get_ticks()
+        self.start_time = self.clock.get_ticks()
         self.start_img = tools.images['ready']
 
+    def prefetch(self, screen):
+        tools.prefetcher.request(['ready', 'set', 'go'])
+        tools.sound_bank.load(tools.sounds['ready-set-go'])
+        yield True
+        for name in ('ready', 'set', 'go'):
+            image = yield from self.prefetched_image(name)
+            tools.render_image(image, self.screen_size, screen)
+            yield True
+
     def get_event(self, event):
         pass
 
     def update(self, screen, dt):
         self.start_img = tools.render_image(self.start_img, self.screen_size, screen)
         self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
+        time_elapsed = self.clock.get_ticks() - self.start_time
         if time_elapsed >= 1000:
             self.start_img = tools.images['set']
         if time_elapsed >= 2000:
@@ -104,26 +168,31 @@ class Start(state_machine.State):
             self.done = True
 
     def draw(self, screen):
-        screen.blit(self.start_img, [0, 0])
+        tools.draw_image(self.start_img, screen)
 
 
 class Taskdone(state_machine.State):
-    """Sets the next state to a random task and then switches to it after 400ms."""
+    """Sets the next state to a random task and then switches to it after 400ms.
+
+    The controller prefetches the next state during the wait.
+    """
 
     def __init__(self):
         state_machine.State.__init__(self)
+        self.prefetch_next = True
 
     def startup(self):
         self.score_check(self.score)
-        self.start_time = pygame.time.get_ticks()
+        self.start_time = self.clock.get_ticks()
 
     def get_event(self, event):
         pass
 
     def update(self, screen, dt):
-        time_elapsed = pygame.time.get_ticks() - self.start_time
+        time_elapsed = self.clock.get_ticks() - self.start_time
         if time_elapsed >= 400:
             self.done = True
+        return []
 
     def draw(self, screen):
         pass
@@ -134,896 +203,83 @@ class Taskdone(state_machine.State):
         Args:
             score (int): Game score.
         """
-        if score == 24:
-            self.next = 'excalibur1'
-        elif score == 49:
-            self.next = 'excalibur2'
-        elif score == 74:
-            self.next = 'excalibur3'
-        elif score == 99:
-            self.next = 'excalibur4'
-        elif score == 100:
+        if score in MILESTONE_TASKS:
+            self.next = MILESTONE_TASKS[score]
+        elif score == WIN_SCORE:
             self.next = 'win'
         else:
-            self.next = random.choice(self.task_list)
-
-
-class Woodchopping(state_machine.State):
-    """Woodchopping task.
-
-    Key Sequence:
-        Right -> Left (5x).
-    """
-
-    def __init__(self):
-        state_machine.State.__init__(self)
-
-    def startup(self):
-        self.count = 0
-        self.left_pressed = False
-        self.right_pressed = False
-        self.right_was_pressed = False
-        self.start_time = pygame.time.get_ticks()
-        self.timer_start = self.timer_check(self.score)
-        self.wood_img = tools.images['woodchopping-1']
-        self.music_check(self.score)
-
-    def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
-            self.left_pressed = True
-            if self.right_was_pressed and not self.right_pressed:
-                self.wood_img = tools.images['woodchopping-1']
-                self.right_was_pressed = False
-                if self.count == 4:
-                    self.wood_img = tools.images['woodchopping-3']
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_RIGHT:
-            self.right_pressed = True
-            if not self.right_was_pressed and not self.left_pressed:
-                self.wood_img = tools.images['woodchopping-2']
-        if event.type == pygame.KEYUP and event.key == pygame.K_LEFT:
-            self.left_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_RIGHT:
-            if self.right_pressed:
-                self.right_pressed = False
-                self.right_was_pressed = True
-
-    def update(self, screen, dt):
-        self.wood_img = tools.render_image(self.wood_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
-
-    def draw(self, screen):
-        screen.blit(self.wood_img, [0, 0])
-
-
-class Drilling(state_machine.State):
-    """Drilling task.
-
-    Key Sequence:
-        Space (5x).
-    """
-
-    def __init__(self):
-        state_machine.State.__init__(self)
-
-    def startup(self):
-        self.count = 0
-        self.start_time = pygame.time.get_ticks()
-        self.timer_start = self.timer_check(self.score)
-        self.drill_img = tools.images['drilling-1']
-        self.music_check(self.score)
-
-    def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-            if self.count == 0:
-                self.drill_img = tools.images['drilling-2']
-            elif self.count == 1:
-                self.drill_img = tools.images['drilling-4']
-            elif self.count == 2:
-                self.drill_img = tools.images['drilling-6']
-            elif self.count == 3:
-                self.drill_img = tools.images['drilling-8']
-            elif self.count == 4:
-                self.drill_img = tools.images['drilling-10']
-        if event.type == pygame.KEYUP and event.key == pygame.K_SPACE:
-            if self.count == 0:
-                self.drill_img = tools.images['drilling-3']
-            elif self.count == 1:
-                self.drill_img = tools.images['drilling-5']
-            elif self.count == 2:
-                self.drill_img = tools.images['drilling-7']
-            elif self.count == 3:
-                self.drill_img = tools.images['drilling-9']
-            elif self.count == 4:
-                self.drill_img = tools.images['drilling-11']
-            self.count += 1
-
-    def update(self, screen, dt):
-        self.drill_img = tools.render_image(self.drill_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
-
-    def draw(self, screen):
-        screen.blit(self.drill_img, [0, 0])
-
-
-class Mining(state_machine.State):
-    """Mining task.
-
-    Key Sequence:
-        Right -> Left (5x).
-    """
-
-    def __init__(self):
-        state_machine.State.__init__(self)
-
-    def startup(self):
-        self.count = 0
-        self.left_pressed = False
-        self.right_pressed = False
-        self.right_was_pressed = False
-        self.start_time = pygame.time.get_ticks()
-        self.timer_start = self.timer_check(self.score)
-        self.mine_img = tools.images['mining-1']
-        self.music_check(self.score)
-
-    def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
-            self.left_pressed = True
-            if self.right_was_pressed and not self.right_pressed:
-                if self.count == 0:
-                    self.mine_img = tools.images['mining-3']
-                elif self.count == 1:
-                    self.mine_img = tools.images['mining-5']
-                elif self.count == 2:
-                    self.mine_img = tools.images['mining-7']
-                elif self.count == 3:
-                    self.mine_img = tools.images['mining-9']
-                elif self.count == 4:
-                    self.mine_img = tools.images['mining-11']
-                self.right_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_RIGHT:
-            self.right_pressed = True
-            if not self.right_was_pressed and not self.left_pressed:
-                if self.count == 0:
-                    self.mine_img = tools.images['mining-2']
-                elif self.count == 1:
-                    self.mine_img = tools.images['mining-4']
-                elif self.count == 2:
-                    self.mine_img = tools.images['mining-6']
-                elif self.count == 3:
-                    self.mine_img = tools.images['mining-8']
-                elif self.count == 4:
-                    self.mine_img = tools.images['mining-10']
-        if event.type == pygame.KEYUP and event.key == pygame.K_LEFT:
-            self.left_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_RIGHT:
-            if self.right_pressed:
-                self.right_pressed = False
-                self.right_was_pressed = True
-
-    def update(self, screen, dt):
-        self.mine_img = tools.render_image(self.mine_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
-
-    def draw(self, screen):
-        screen.blit(self.mine_img, [0, 0])
-
-
-class Flagraising(state_machine.State):
-    """Flagraising task.
-
-    Key Sequence:
-        Down -> Up (5x).
-    """
-
-    def __init__(self):
-        state_machine.State.__init__(self)
-
-    def startup(self):
-        self.count = 0
-        self.up_pressed = False
-        self.down_pressed = False
-        self.down_was_pressed = False
-        self.start_time = pygame.time.get_ticks()
-        self.timer_start = self.timer_check(self.score)
-        self.flag_img = tools.images['flagraising-1']
-        self.music_check(self.score)
-
-    def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_UP:
-            self.up_pressed = True
-            if self.down_was_pressed and not self.down_pressed:
-                if self.count == 0:
-                    self.flag_img = tools.images['flagraising-3']
-                elif self.count == 1:
-                    self.flag_img = tools.images['flagraising-5']
-                elif self.count == 2:
-                    self.flag_img = tools.images['flagraising-7']
-                elif self.count == 3:
-                    self.flag_img = tools.images['flagraising-9']
-                elif self.count == 4:
-                    self.flag_img = tools.images['flagraising-11']
-                self.down_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_DOWN:
-            self.down_pressed = True
-            if not self.down_was_pressed and not self.up_pressed:
-                if self.count == 0:
-                    self.flag_img = tools.images['flagraising-2']
-                elif self.count == 1:
-                    self.flag_img = tools.images['flagraising-4']
-                elif self.count == 2:
-                    self.flag_img = tools.images['flagraising-6']
-                elif self.count == 3:
-                    self.flag_img = tools.images['flagraising-8']
-                elif self.count == 4:
-                    self.flag_img = tools.images['flagraising-10']
-        if event.type == pygame.KEYUP and event.key == pygame.K_UP:
-            self.up_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_DOWN:
-            if self.down_pressed:
-                self.down_pressed = False
-                self.down_was_pressed = True
-
-    def update(self, screen, dt):
-        self.flag_img = tools.render_image(self.flag_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
-
-    def draw(self, screen):
-        screen.blit(self.flag_img, [0, 0])
-
-
-class Hammering(state_machine.State):
-    """Hammering task.
-
-    Key Sequence:
-        Space (10x).
-    """
-
-    def __init__(self):
-        state_machine.State.__init__(self)
-
-    def startup(self):
-        self.count = 0
-        self.start_time = pygame.time.get_ticks()
-        self.timer_start = self.timer_check(self.score)
-        self.hammer_img = tools.images['hammering-1']
-        self.music_check(self.score)
-
-    def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-            if self.count == 0:
-                self.hammer_img = tools.images['hammering-2']
-            elif self.count == 0.5:
-                self.hammer_img = tools.images['hammering-4']
-            elif self.count == 1:
-                self.hammer_img = tools.images['hammering-6']
-            elif self.count == 1.5:
-                self.hammer_img = tools.images['hammering-8']
-            elif self.count == 2:
-                self.hammer_img = tools.images['hammering-10']
-            elif self.count == 2.5:
-                self.hammer_img = tools.images['hammering-12']
-            elif self.count == 3:
-                self.hammer_img = tools.images['hammering-14']
-            elif self.count == 3.5:
-                self.hammer_img = tools.images['hammering-16']
-            elif self.count == 4:
-                self.hammer_img = tools.images['hammering-18']
-            elif self.count == 4.5:
-                self.hammer_img = tools.images['hammering-20']
-        if event.type == pygame.KEYUP and event.key == pygame.K_SPACE:
-            if self.count == 0:
-                self.hammer_img = tools.images['hammering-3']
-            elif self.count == 0.5:
-                self.hammer_img = tools.images['hammering-5']
-            elif self.count == 1:
-                self.hammer_img = tools.images['hammering-7']
-            elif self.count == 1.5:
-                self.hammer_img = tools.images['hammering-9']
-            elif self.count == 2:
-                self.hammer_img = tools.images['hammering-11']
-            elif self.count == 2.5:
-                self.hammer_img = tools.images['hammering-13']
-            elif self.count == 3:
-                self.hammer_img = tools.images['hammering-15']
-            elif self.count == 3.5:
-                self.hammer_img = tools.images['hammering-17']
-            elif self.count == 4:
-                self.hammer_img = tools.images['hammering-19']
-            elif self.count == 4.5:
-                self.hammer_img = tools.images['hammering-21']
-            self.count += 0.5
-
-    def update(self, screen, dt):
-        self.hammer_img = tools.render_image(self.hammer_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
-
-    def draw(self, screen):
-        screen.blit(self.hammer_img, [0, 0])
-
-
-class Tirepumping(state_machine.State):
-    """Tirepumping task.
-
-    Key Sequence:
-        Down -> Up (5x).
-    """
-
-    def __init__(self):
-        state_machine.State.__init__(self)
-
-    def startup(self):
-        self.count = 0
-        self.up_pressed = False
-        self.down_pressed = False
-        self.down_was_pressed = False
-        self.start_time = pygame.time.get_ticks()
-        self.timer_start = self.timer_check(self.score)
-        self.tire_img = tools.images['tirepumping-1']
-        self.music_check(self.score)
-
-    def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_UP:
-            self.up_pressed = True
-            if self.down_was_pressed and not self.down_pressed:
-                if self.count == 0:
-                    self.tire_img = tools.images['tirepumping-3']
-                elif self.count == 1:
-                    self.tire_img = tools.images['tirepumping-5']
-                elif self.count == 2:
-                    self.tire_img = tools.images['tirepumping-7']
-                elif self.count == 3:
-                    self.tire_img = tools.images['tirepumping-9']
-                elif self.count == 4:
-                    self.tire_img = tools.images['tirepumping-11']
-                self.down_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_DOWN:
-            self.down_pressed = True
-            if not self.down_was_pressed and not self.up_pressed:
-                if self.count == 0:
-                    self.tire_img = tools.images['tirepumping-2']
-                elif self.count == 1:
-                    self.tire_img = tools.images['tirepumping-4']
-                elif self.count == 2:
-                    self.tire_img = tools.images['tirepumping-6']
-                elif self.count == 3:
-                    self.tire_img = tools.images['tirepumping-8']
-                elif self.count == 4:
-                    self.tire_img = tools.images['tirepumping-10']
-        if event.type == pygame.KEYUP and event.key == pygame.K_UP:
-            self.up_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_DOWN:
-            if self.down_pressed:
-                self.down_pressed = False
-                self.down_was_pressed = True
-
-    def update(self, screen, dt):
-        self.tire_img = tools.render_image(self.tire_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
-
-    def draw(self, screen):
-        screen.blit(self.tire_img, [0, 0])
-
-
-class Excalibur1(state_machine.State):
-    """Excalibur1 task.
-
-    Key Sequence:
-        Up -> Up, Down -> Down, Left -> Right, Left -> Right, Space -> Space.
-    """
-
-    def __init__(self):
-        state_machine.State.__init__(self)
-
-    def startup(self):
-        self.count = 0
-        self.up_pressed = False
-        self.up_was_pressed = False
-        self.down_pressed = False
-        self.down_was_pressed = False
-        self.left_pressed = False
-        self.left_was_pressed = False
-        self.right_pressed = False
-        self.right_was_pressed = False
-        self.space_pressed = False
-        self.space_was_pressed = False
-        self.start_time = pygame.time.get_ticks()
-        self.timer_start = self.timer_check(self.score)
-        self.excalibur1_img = tools.images['excalibur-1-1']
-        self.music_check(self.score)
+            self.next = self.rng.choice(self.task_list)
 
-    def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_UP:
-            self.up_pressed = True
-            if not self.up_was_pressed and self.count == 0:
-                self.excalibur1_img = tools.images['excalibur-1-2']
-            elif self.up_was_pressed and self.count == 0:
-                self.excalibur1_img = tools.images['excalibur-1-3']
-                self.up_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_DOWN:
-            self.down_pressed = True
-            if not self.down_was_pressed and self.count == 1:
-                self.excalibur1_img = tools.images['excalibur-1-4']
-            elif self.down_was_pressed and self.count == 1:
-                self.excalibur1_img = tools.images['excalibur-1-5']
-                self.down_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
-            self.left_pressed = True
-            if not self.left_was_pressed and self.count == 2:
-                self.excalibur1_img = tools.images['excalibur-1-6']
-            elif not self.left_was_pressed and self.count == 3:
-                self.excalibur1_img = tools.images['excalibur-1-8']
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_RIGHT:
-            self.right_pressed = True
-            if self.left_was_pressed and self.count == 2:
-                self.excalibur1_img = tools.images['excalibur-1-7']
-                self.left_was_pressed = False
-                self.count += 1
-            elif self.left_was_pressed and self.count == 3:
-                self.excalibur1_img = tools.images['excalibur-1-9']
-                self.left_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-            self.space_pressed = True
-            if not self.space_was_pressed and self.count == 4:
-                self.excalibur1_img = tools.images['excalibur-1-10']
-            elif self.space_was_pressed and self.count == 4:
-                self.excalibur1_img = tools.images['excalibur-1-11']
-                self.space_was_pressed = False
-                self.count += 1
-        if event.type == pygame.KEYUP and event.key == pygame.K_UP:
-            if self.up_pressed:
-                if self.count == 0:
-                    self.up_was_pressed = True
-                self.up_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_DOWN:
-            if self.down_pressed:
-                if self.count == 1:
-                    self.down_was_pressed = True
-                self.down_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_LEFT:
-            if self.left_pressed:
-                if self.count == 2 or self.count == 3:
-                    self.left_was_pressed = True
-                self.left_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_RIGHT:
-            if self.right_pressed:
-                if self.count == 2 or self.count == 3:
-                    self.right_was_pressed = True
-                self.right_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_SPACE:
-            if self.space_pressed:
-                if self.count == 4:
-                    self.space_was_pressed = True
-                self.space_pressed = False
-
-    def update(self, screen, dt):
-        self.excalibur1_img = tools.render_image(self.excalibur1_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
-
-    def draw(self, screen):
-        screen.blit(self.excalibur1_img, [0, 0])
 
+class Task(state_machine.State):
+    """Work task driven by the transition table of its description in tasks.TASKS.
 
-class Excalibur2(state_machine.State):
-    """Excalibur2 task.
+    Each key event is handled with a single table lookup, and the frames
+    of the task are looked up once when the task starts, before its timer
+    starts, so decoding them does not count against the player. The prefetch
+    has the frames decoded on the prefetcher thread and scales them one at a
+    time. The frames are pinned in the image cache from the prefetch until
+    the next task is prefetched. Assets are not streamed in while a task runs.
 
-    Key Sequence:
-        Up -> Up, Down -> Down, Left -> Right, Left -> Right, Space -> Space.
+    Attributes:
+        name (str): Name of the task.
+        task (dict): The task description.
+        frame_names (list): Image names of the frames of the task.
+        table (dict): (event type, key, node) mapped to (next node, frame index or None).
+        counts (list): The task count of each node.
     """
 
-    def __init__(self):
+    def __init__(self, name):
         state_machine.State.__init__(self)
+        self.streaming = False
+        self.name = name
+        self.task = tasks.TASKS[name]
+        self.frame_names = tasks.frame_names(self.task)
+        self.table, self.counts = tasks.compile_task(self.task)
 
     def startup(self):
+        self.node = 0
         self.count = 0
-        self.up_pressed = False
-        self.up_was_pressed = False
-        self.down_pressed = False
-        self.down_was_pressed = False
-        self.left_pressed = False
-        self.left_was_pressed = False
-        self.right_pressed = False
-        self.right_was_pressed = False
-        self.space_pressed = False
-        self.space_was_pressed = False
-        self.start_time = pygame.time.get_ticks()
-        self.timer_start = self.timer_check(self.score)
-        self.excalibur2_img = tools.images['excalibur-2-1']
+        tools.images.pin(self.frame_names)
+        self.frames = [tools.images[name] for name in self.frame_names]
+        self.task_img = self.frames[0]
+        self.input_time = None
         self.music_check(self.score)
-
-    def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_UP:
-            self.up_pressed = True
-            if not self.up_was_pressed and self.count == 0:
-                self.excalibur2_img = tools.images['excalibur-2-2']
-            elif self.up_was_pressed and self.count == 0:
-                self.excalibur2_img = tools.images['excalibur-2-3']
-                self.up_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_DOWN:
-            self.down_pressed = True
-            if not self.down_was_pressed and self.count == 1:
-                self.excalibur2_img = tools.images['excalibur-2-4']
-            elif self.down_was_pressed and self.count == 1:
-                self.excalibur2_img = tools.images['excalibur-2-5']
-                self.down_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
-            self.left_pressed = True
-            if not self.left_was_pressed and self.count == 2:
-                self.excalibur2_img = tools.images['excalibur-2-6']
-            elif not self.left_was_pressed and self.count == 3:
-                self.excalibur2_img = tools.images['excalibur-2-8']
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_RIGHT:
-            self.right_pressed = True
-            if self.left_was_pressed and self.count == 2:
-                self.excalibur2_img = tools.images['excalibur-2-7']
-                self.left_was_pressed = False
-                self.count += 1
-            elif self.left_was_pressed and self.count == 3:
-                self.excalibur2_img = tools.images['excalibur-2-9']
-                self.left_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-            self.space_pressed = True
-            if not self.space_was_pressed and self.count == 4:
-                self.excalibur2_img = tools.images['excalibur-2-10']
-            elif self.space_was_pressed and self.count == 4:
-                self.excalibur2_img = tools.images['excalibur-2-11']
-                self.space_was_pressed = False
-                self.count += 1
-        if event.type == pygame.KEYUP and event.key == pygame.K_UP:
-            if self.up_pressed:
-                if self.count == 0:
-                    self.up_was_pressed = True
-                self.up_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_DOWN:
-            if self.down_pressed:
-                if self.count == 1:
-                    self.down_was_pressed = True
-                self.down_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_LEFT:
-            if self.left_pressed:
-                if self.count == 2 or self.count == 3:
-                    self.left_was_pressed = True
-                self.left_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_RIGHT:
-            if self.right_pressed:
-                if self.count == 2 or self.count == 3:
-                    self.right_was_pressed = True
-                self.right_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_SPACE:
-            if self.space_pressed:
-                if self.count == 4:
-                    self.space_was_pressed = True
-                self.space_pressed = False
-
-    def update(self, screen, dt):
-        self.excalibur2_img = tools.render_image(self.excalibur2_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
-
-    def draw(self, screen):
-        screen.blit(self.excalibur2_img, [0, 0])
-
-
-class Excalibur3(state_machine.State):
-    """Excalibur3 task.
-
-    Key Sequence:
-        Up -> Up, Down -> Down, Left -> Right, Left -> Right, Space -> Space.
-    """
-
-    def __init__(self):
-        state_machine.State.__init__(self)
-
-    def startup(self):
-        self.count = 0
-        self.up_pressed = False
-        self.up_was_pressed = False
-        self.down_pressed = False
-        self.down_was_pressed = False
-        self.left_pressed = False
-        self.left_was_pressed = False
-        self.right_pressed = False
-        self.right_was_pressed = False
-        self.space_pressed = False
-        self.space_was_pressed = False
-        self.start_time = pygame.time.get_ticks()
+        self.start_time = self.clock.get_ticks()
         self.timer_start = self.timer_check(self.score)
-        self.excalibur3_img = tools.images['excalibur-3-1']
-        self.music_check(self.score)
 
     def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_UP:
-            self.up_pressed = True
-            if not self.up_was_pressed and self.count == 0:
-                self.excalibur3_img = tools.images['excalibur-3-2']
-            elif self.up_was_pressed and self.count == 0:
-                self.excalibur3_img = tools.images['excalibur-3-3']
-                self.up_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_DOWN:
-            self.down_pressed = True
-            if not self.down_was_pressed and self.count == 1:
-                self.excalibur3_img = tools.images['excalibur-3-4']
-            elif self.down_was_pressed and self.count == 1:
-                self.excalibur3_img = tools.images['excalibur-3-5']
-                self.down_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
-            self.left_pressed = True
-            if not self.left_was_pressed and self.count == 2:
-                self.excalibur3_img = tools.images['excalibur-3-6']
-            elif not self.left_was_pressed and self.count == 3:
-                self.excalibur3_img = tools.images['excalibur-3-8']
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_RIGHT:
-            self.right_pressed = True
-            if self.left_was_pressed and self.count == 2:
-                self.excalibur3_img = tools.images['excalibur-3-7']
-                self.left_was_pressed = False
-                self.count += 1
-            elif self.left_was_pressed and self.count == 3:
-                self.excalibur3_img = tools.images['excalibur-3-9']
-                self.left_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-            self.space_pressed = True
-            if not self.space_was_pressed and self.count == 4:
-                self.excalibur3_img = tools.images['excalibur-3-10']
-            elif self.space_was_pressed and self.count == 4:
-                self.excalibur3_img = tools.images['excalibur-3-11']
-                self.space_was_pressed = False
-                self.count += 1
-        if event.type == pygame.KEYUP and event.key == pygame.K_UP:
-            if self.up_pressed:
-                if self.count == 0:
-                    self.up_was_pressed = True
-                self.up_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_DOWN:
-            if self.down_pressed:
-                if self.count == 1:
-                    self.down_was_pressed = True
-                self.down_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_LEFT:
-            if self.left_pressed:
-                if self.count == 2 or self.count == 3:
-                    self.left_was_pressed = True
-                self.left_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_RIGHT:
-            if self.right_pressed:
-                if self.count == 2 or self.count == 3:
-                    self.right_was_pressed = True
-                self.right_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_SPACE:
-            if self.space_pressed:
-                if self.count == 4:
-                    self.space_was_pressed = True
-                self.space_pressed = False
+        if event.type == pygame.KEYDOWN or event.type == pygame.KEYUP:
+            transition = self.table.get((event.type, event.key, self.node))
+            if transition is not None:
+                self.node, frame = transition
+                self.count = self.counts[self.node]
+                if frame is not None:
+                    self.task_img = self.frames[frame]
+                    if event.type == pygame.KEYDOWN and self.input_time is None:
+                        self.input_time = self.event_time
 
     def update(self, screen, dt):
-        self.excalibur3_img = tools.render_image(self.excalibur3_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
+        self.task_img = tools.render_image(self.task_img, self.screen_size, screen)
+        return self.update_task(screen, self.task_img)
+
+    def prefetch(self, screen):
+        tools.images.pin(self.frame_names)
+        tools.prefetcher.request(self.frame_names)
+        tools.sound_bank.load(tools.sounds['task-done'])
+        yield True
+        if self.score in state_machine.MUSIC_TRACKS:
+            tools.music.read(tools.sounds[state_machine.MUSIC_TRACKS[self.score]])
+            yield True
+        tools.get_glyph_atlas(tools.fonts['OpenSans-Regular'], tools.BLACK, 40)
+        yield True
+        for name in self.frame_names:
+            frame = yield from self.prefetched_image(name)
+            tools.render_image(frame, self.screen_size, screen)
+            yield True
 
     def draw(self, screen):
-        screen.blit(self.excalibur3_img, [0, 0])
-
-
-class Excalibur4(state_machine.State):
-    """Excalibur4 task.
-
-    Key Sequence:
-        Up -> Up, Down -> Down, Left -> Right, Left -> Right, Space -> Space.
-    """
-
-    def __init__(self):
-        state_machine.State.__init__(self)
-
-    def startup(self):
-        self.count = 0
-        self.up_pressed = False
-        self.up_was_pressed = False
-        self.down_pressed = False
-        self.down_was_pressed = False
-        self.left_pressed = False
-        self.left_was_pressed = False
-        self.right_pressed = False
-        self.right_was_pressed = False
-        self.space_pressed = False
-        self.space_was_pressed = False
-        self.start_time = pygame.time.get_ticks()
-        self.timer_start = self.timer_check(self.score)
-        self.excalibur4_img = tools.images['excalibur-4-1']
-        self.music_check(self.score)
-
-    def get_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_UP:
-            self.up_pressed = True
-            if not self.up_was_pressed and self.count == 0:
-                self.excalibur4_img = tools.images['excalibur-4-2']
-            elif self.up_was_pressed and self.count == 0:
-                self.excalibur4_img = tools.images['excalibur-4-3']
-                self.up_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_DOWN:
-            self.down_pressed = True
-            if not self.down_was_pressed and self.count == 1:
-                self.excalibur4_img = tools.images['excalibur-4-4']
-            elif self.down_was_pressed and self.count == 1:
-                self.excalibur4_img = tools.images['excalibur-4-5']
-                self.down_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
-            self.left_pressed = True
-            if not self.left_was_pressed and self.count == 2:
-                self.excalibur4_img = tools.images['excalibur-4-6']
-            elif not self.left_was_pressed and self.count == 3:
-                self.excalibur4_img = tools.images['excalibur-4-8']
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_RIGHT:
-            self.right_pressed = True
-            if self.left_was_pressed and self.count == 2:
-                self.excalibur4_img = tools.images['excalibur-4-7']
-                self.left_was_pressed = False
-                self.count += 1
-            elif self.left_was_pressed and self.count == 3:
-                self.excalibur4_img = tools.images['excalibur-4-9']
-                self.left_was_pressed = False
-                self.count += 1
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-            self.space_pressed = True
-            if not self.space_was_pressed and self.count == 4:
-                self.excalibur4_img = tools.images['excalibur-4-10']
-            elif self.space_was_pressed and self.count == 4:
-                self.excalibur4_img = tools.images['excalibur-4-11']
-                self.space_was_pressed = False
-                self.count += 1
-        if event.type == pygame.KEYUP and event.key == pygame.K_UP:
-            if self.up_pressed:
-                if self.count == 0:
-                    self.up_was_pressed = True
-                self.up_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_DOWN:
-            if self.down_pressed:
-                if self.count == 1:
-                    self.down_was_pressed = True
-                self.down_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_LEFT:
-            if self.left_pressed:
-                if self.count == 2 or self.count == 3:
-                    self.left_was_pressed = True
-                self.left_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_RIGHT:
-            if self.right_pressed:
-                if self.count == 2 or self.count == 3:
-                    self.right_was_pressed = True
-                self.right_pressed = False
-        elif event.type == pygame.KEYUP and event.key == pygame.K_SPACE:
-            if self.space_pressed:
-                if self.count == 4:
-                    self.space_was_pressed = True
-                self.space_pressed = False
-
-    def update(self, screen, dt):
-        self.excalibur4_img = tools.render_image(self.excalibur4_img, self.screen_size, screen)
-        self.draw(screen)
-        time_elapsed = pygame.time.get_ticks() - self.start_time
-        timer_seconds = float(time_elapsed / 1000 % 60)
-        timer = round(self.timer_start - timer_seconds, 1)
-        timer_text = 'Timer: ' + str(timer)
-        score_text = 'Score: ' + str(self.score)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, timer_text, 40, self.screen_width/2, 0, screen)
-        tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, score_text, 40, self.screen_width-150, 0, screen)
-        tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, score_text, 40, self.screen_width-150, 0, screen)
-        tools.draw_progress_bar(self.screen_width-100, self.screen_height/4, self.count*20, screen)
-        self.count_check(self.count, timer)
-
-    def draw(self, screen):
-        screen.blit(self.excalibur4_img, [0, 0])
+        tools.draw_image(self.task_img, screen)
 
 
 class Loss(state_machine.State):
@@ -1032,6 +288,7 @@ class Loss(state_machine.State):
     def __init__(self):
         state_machine.State.__init__(self)
         self.next = 'menu'
+        self.idle = True
 
     def startup(self):
         self.loss_img = tools.images['game-over']
@@ -1046,12 +303,15 @@ class Loss(state_machine.State):
 
     def update(self, screen, dt):
         self.loss_img = tools.render_image(self.loss_img, self.screen_size, screen)
+        if self.loss_img is self.drawn_img:
+            return []
         self.draw(screen)
+        self.drawn_img = self.loss_img
         tools.clear_text(tools.fonts['OpenSans-Regular'], tools.WHITE, self.score_text, 100, self.screen_width/2, self.screen_height/2.5, screen)
         tools.render_text(tools.fonts['OpenSans-Regular'], tools.BLACK, self.score_text, 100, self.screen_width/2, self.screen_height/2.5, screen)
 
     def draw(self, screen):
-        screen.blit(self.loss_img, [0, 0])
+        tools.draw_image(self.loss_img, screen)
 
 
 class Win(state_machine.State):
@@ -1060,11 +320,20 @@ class Win(state_machine.State):
     def __init__(self):
         state_machine.State.__init__(self)
         self.next = 'menu'
+        self.idle = True
 
     def startup(self):
         self.win_img = tools.images['winner']
         tools.play_music(tools.sounds['future-grid'])
 
+    def prefetch(self, screen):
+        tools.prefetcher.request(['winner'])
+        tools.music.read(tools.sounds['future-grid'])
+        yield True
+        winner = yield from self.prefetched_image('winner')
+        tools.render_image(winner, self.screen_size, screen)
+        yield True
+
     def get_event(self, event):
         if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
             self.quit = True
@@ -1073,7 +342,10 @@ class Win(state_machine.State):
 
     def update(self, screen, dt):
         self.win_img = tools.render_image(self.win_img, self.screen_size, screen)
+        if self.win_img is self.drawn_img:
+            return []
         self.draw(screen)
+        self.drawn_img = self.win_img
 
     def draw(self, screen):
-        screen.blit(self.win_img, [0, 0])
+        tools.draw_image(self.win_img, screen)
@@ -0,0 +1,274 @@
+"""Tasks
+
+This module describes the work tasks as data. Each task names a key
+pattern, the keys it uses, and the frames shown at each step. The task
+states run on transition tables compiled from these descriptions.
+"""
+
+
+import pygame
+
+
+def press_release(task, step, flags, event_type, key):
+    """One key is pressed and released for each step.
+
+    Pressing shows the press frame of the step, and releasing shows
+    the release frame and finishes the step.
+
+    Args:
+        task (dict): The task description.
+        step (int): Steps finished so far.
+        flags (frozenset): Keys held or released, as tracked by the pattern.
+        event_type (int): KEYDOWN or KEYUP.
+        key (int): The key of the event.
+
+    Returns:
+        transition (tup): The next step and flags, and the frame to show or None.
+    """
+    if key != task['key']:
+        return step, flags, None
+    if event_type == pygame.KEYDOWN:
+        return step, flags, task['press'][step]
+    return step + 1, flags, task['release'][step]
+
+
+def alternate(task, step, flags, event_type, key):
+    """An arm key is pressed and released, then a strike key is pressed for each step.
+
+    The arm frame is shown when the arm key is pressed while the strike key
+    is up, and the strike frame is shown when the strike key finishes the step.
+
+    Args:
+        task (dict): The task description.
+        step (int): Steps finished so far.
+        flags (frozenset): 'arm_held', 'strike_held' and 'armed', as tracked by the pattern.
+        event_type (int): KEYDOWN or KEYUP.
+        key (int): The key of the event.
+
+    Returns:
+        transition (tup): The next step and flags, and the frame to show or None.
+    """
+    arm, strike = task['keys']
+    frame = None
+    if event_type == pygame.KEYDOWN and key == strike:
+        flags = flags | {'strike_held'}
+        if 'armed' in flags and 'arm_held' not in flags:
+            frame = task['strike'][step]
+            flags = flags - {'armed'}
+            step += 1
+    elif event_type == pygame.KEYDOWN and key == arm:
+        flags = flags | {'arm_held'}
+        if 'armed' not in flags and 'strike_held' not in flags:
+            frame = task['arm'][step]
+    elif event_type == pygame.KEYUP and key == strike:
+        flags = flags - {'strike_held'}
+    elif event_type == pygame.KEYUP and key == arm and 'arm_held' in flags:
+        flags = flags - {'arm_held'} | {'armed'}
+    return step, flags, frame
+
+
+def sequence(task, step, flags, event_type, key):
+    """Each step is a first key pressed and released, then a second key pressed.
+
+    The first key may be the same as the second key. Its frame is shown
+    when it is pressed, and the second frame when the second key finishes the step.
+
+    Args:
+        task (dict): The task description.
+        step (int): Steps finished so far.
+        flags (frozenset): ('held', key) and ('released', key) pairs, as tracked by the pattern.
+        event_type (int): KEYDOWN or KEYUP.
+        key (int): The key of the event.
+
+    Returns:
+        transition (tup): The next step and flags, and the frame to show or None.
+    """
+    first, second, first_frame, second_frame = task['sequence'][step]
+    frame = None
+    if event_type == pygame.KEYDOWN:
+        flags = flags | {('held', key)}
+        if key == first and ('released', first) not in flags:
+            frame = first_frame
+        elif key == second and ('released', first) in flags:
+            frame = second_frame
+            flags = flags - {('released', first)}
+            step += 1
+    elif ('held', key) in flags:
+        if key in (first, second):
+            flags = flags | {('released', key)}
+        flags = flags - {('held', key)}
+    return step, flags, frame
+
+
+PATTERNS = {
+    'press_release': press_release,
+    'alternate': alternate,
+    'sequence': sequence
+    }
+
+
+def excalibur(stage):
+    """Describes an Excalibur stage, which all share one key sequence.
+
+    Args:
+        stage (int): The Excalibur stage from 1 to 4.
+
+    Returns:
+        task (dict): The task description.
+    """
+    return {
+        'description': 'Up -> Up, Down -> Down, Left -> Right, Left -> Right, Space -> Space.',
+        'frames': 'excalibur-{}-{{}}'.format(stage),
+        'frame_count': 11,
+        'pattern': 'sequence',
+        'steps': 5,
+        'count_per_step': 1,
+        'sequence': [
+            (pygame.K_UP, pygame.K_UP, 2, 3),
+            (pygame.K_DOWN, pygame.K_DOWN, 4, 5),
+            (pygame.K_LEFT, pygame.K_RIGHT, 6, 7),
+            (pygame.K_LEFT, pygame.K_RIGHT, 8, 9),
+            (pygame.K_SPACE, pygame.K_SPACE, 10, 11)
+            ]
+        }
+
+
+TASKS = {
+    'drilling': {
+        'description': 'Space (5x).',
+        'frames': 'drilling-{}',
+        'frame_count': 11,
+        'pattern': 'press_release',
+        'steps': 5,
+        'count_per_step': 1,
+        'key': pygame.K_SPACE,
+        'press': [2, 4, 6, 8, 10],
+        'release': [3, 5, 7, 9, 11]
+        },
+    'hammering': {
+        'description': 'Space (10x).',
+        'frames': 'hammering-{}',
+        'frame_count': 21,
+        'pattern': 'press_release',
+        'steps': 10,
+        'count_per_step': 0.5,
+        'key': pygame.K_SPACE,
+        'press': [2, 4, 6, 8, 10, 12, 14, 16, 18, 20],
+        'release': [3, 5, 7, 9, 11, 13, 15, 17, 19, 21]
+        },
+    'mining': {
+        'description': 'Right -> Left (5x).',
+        'frames': 'mining-{}',
+        'frame_count': 11,
+        'pattern': 'alternate',
+        'steps': 5,
+        'count_per_step': 1,
+        'keys': (pygame.K_RIGHT, pygame.K_LEFT),
+        'arm': [2, 4, 6, 8, 10],
+        'strike': [3, 5, 7, 9, 11]
+        },
+    'woodchopping': {
+        'description': 'Right -> Left (5x).',
+        'frames': 'woodchopping-{}',
+        'frame_count': 3,
+        'pattern': 'alternate',
+        'steps': 5,
+        'count_per_step': 1,
+        'keys': (pygame.K_RIGHT, pygame.K_LEFT),
+        'arm': [2, 2, 2, 2, 2],
+        'strike': [1, 1, 1, 1, 3]
+        },
+    'flagraising': {
+        'description': 'Down -> Up (5x).',
+        'frames': 'flagraising-{}',
+        'frame_count': 11,
+        'pattern': 'alternate',
+        'steps': 5,
+        'count_per_step': 1,
+        'keys': (pygame.K_DOWN, pygame.K_UP),
+        'arm': [2, 4, 6, 8, 10],
+        'strike': [3, 5, 7, 9, 11]
+        },
+    'tirepumping': {
+        'description': 'Down -> Up (5x).',
+        'frames': 'tirepumping-{}',
+        'frame_count': 11,
+        'pattern': 'alternate',
+        'steps': 5,
+        'count_per_step': 1,
+        'keys': (pygame.K_DOWN, pygame.K_UP),
+        'arm': [2, 4, 6, 8, 10],
+        'strike': [3, 5, 7, 9, 11]
+        },
+    'excalibur1': excalibur(1),
+    'excalibur2': excalibur(2),
+    'excalibur3': excalibur(3),
+    'excalibur4': excalibur(4)
+    }
+
+
+def task_keys(task):
+    """Returns the keys used by a task.
+
+    Args:
+        task (dict): The task description.
+
+    Returns:
+        keys (set): The keys of the task.
+    """
+    if task['pattern'] == 'press_release':
+        return {task['key']}
+    elif task['pattern'] == 'alternate':
+        return set(task['keys'])
+    return {key for first, second, first_frame, second_frame in task['sequence'] for key in (first, second)}
+
+
+def frame_names(task):
+    """Returns the image names of the frames of a task, starting with the first frame.
+
+    Args:
+        task (dict): The task description.
+
+    Returns:
+        names (list): The image names.
+    """
+    return [task['frames'].format(i) for i in range(1, task['frame_count'] + 1)]
+
+
+def compile_task(task):
+    """Compiles a task description into a transition table.
+
+    Every node reachable from the start is visited once, and each key
+    event that changes the node or the frame becomes one table entry.
+    Nodes that have finished all steps have no transitions.
+
+    Args:
+        task (dict): The task description.
+
+    Returns:
+        table (dict): (event type, key, node) mapped to (next node, frame index or None).
+        counts (list): The task count of each node. Node 0 is the start.
+    """
+    pattern = PATTERNS[task['pattern']]
+    keys = sorted(task_keys(task))
+    nodes = {(0, frozenset()): 0}
+    pending = [(0, frozenset())]
+    counts = [0]
+    table = {}
+    while pending:
+        node = pending.pop()
+        step, flags = node
+        if step >= task['steps']:
+            continue
+        for event_type in (pygame.KEYDOWN, pygame.KEYUP):
+            for key in keys:
+                next_step, next_flags, frame = pattern(task, step, flags, event_type, key)
+                next_node = (next_step, next_flags)
+                if next_node not in nodes:
+                    nodes[next_node] = len(counts)
+                    counts.append(next_step * task['count_per_step'])
+                    pending.append(next_node)
+                if next_node != node or frame is not None:
+                    frame_index = None if frame is None else frame - 1
+                    table[(event_type, key, nodes[node])] = (nodes[next_node], frame_index)
+    return table, counts
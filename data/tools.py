@@ -5,21 +5,58 @@ variables for the game, especially in relation to assets.
 """
 
 
+import logging
 import os
+import weakref
+from collections import OrderedDict
 
 import pygame
 
+from .audio import MusicPlayer, SoundBank
+from .images import DeltaFrame, ImageCache, load_image, open_bundle
+from .runtime import count_load, init_module
+
+
+logger = logging.getLogger(__name__)
+
 
 # asset folder paths
 IMG_DIR = os.path.join('assets', 'images')
 SND_DIR = os.path.join('assets', 'sounds')
 FNT_DIR = os.path.join('assets', 'fonts')
+BUNDLE_PATH = os.path.join('assets', 'images.bundle')
+
 
 # asset dictionaries
-images = {}
+images = ImageCache()
+# the asset loader started by the loading screen
+asset_loader = None
+# the worker decoding the images of prefetched states, started by the state controller
+prefetcher = None
+sound_bank = SoundBank()
+music = MusicPlayer()
 sounds = {}
 fonts = {}
 
+# font registry and rendered text cache
+TEXT_CACHE_SIZE = 128
+font_cache = {}
+text_cache = OrderedDict()
+text_sizes = OrderedDict()
+text_stats = {'hits': 0, 'misses': 0}
+
+# glyph atlas for the HUD
+HUD_LABELS = ('Timer: ', 'Score: ')
+HUD_GLYPHS = '0123456789.-'
+glyph_atlas = {}
+glyph_sizes = {}
+
+# images scaled to the window size
+SCALE_QUALITIES = ('smooth', 'fast', 'integer')
+scale_quality = 'smooth'
+scaled_images = weakref.WeakKeyDictionary()
+scaled_sources = weakref.WeakKeyDictionary()
+
 # colors
 WHITE = (253, 250, 243)
 BLACK = (56, 54, 57)
@@ -34,32 +71,68 @@ def change_icon(filename):
     Args:
         filename (str): The filename of the icon in the images directory, including the extension.
     """
-    icon = pygame.image.load(os.path.join(IMG_DIR, filename))
+    icon = read_image(filename)
     icon = icon.convert_alpha()
     pygame.display.set_icon(icon)
 
 
-def load_images(directory, colorkey=(0, 0, 0), extensions=('.png', '.jpg', '.bmp')):
-    """Loads all images with the specified file extensions.
+def use_bundle(bundle_path):
+    """Opens the image bundle for the image cache, unless it is already open.
+
+    Args:
+        bundle_path (str): Path to the image bundle.
+    """
+    with images.lock:
+        if images.bundle is None or images.bundle.path != bundle_path:
+            images.bundle = open_bundle(bundle_path)
+
+
+def read_image(filename, colorkey=None):
+    """Reads an image that is needed before the images are registered, such as the icon or loading screen.
+
+    The image is read from the image bundle if there is one, so the game
+    also runs from an install that only ships the bundle.
+
+    Args:
+        filename (str): The filename of the image in the images directory, including the extension.
+        colorkey  (tup): Used to set colorkey if no alpha transparency is found in image.
+
+    Returns:
+        img (obj): The image.
+    """
+    use_bundle(BUNDLE_PATH)
+    name = os.path.splitext(filename)[0]
+    if images.bundle is not None and name in images.bundle:
+        return images.bundle.surface(name, colorkey)
+    return load_image(os.path.join(IMG_DIR, filename), colorkey)
+
+
+def load_images(directory, colorkey=(0, 0, 0), extensions=('.png', '.jpg', '.bmp'), bundle_path=None):
+    """Registers all images with the specified file extensions.
+
+    The images are decoded lazily the first time they are looked up.
+    If an image bundle exists, the images are read from it instead of
+    the directory, which then doesn't need to exist.
 
     Args:
         directory (str): Path to the directory that contains the files.
         colorkey  (tup): Used to set colorkey if no alpha transparency is found in image.
         extensions (tup): The file extensions accepted by the function.
+        bundle_path (str): Path to the image bundle. Defaults to BUNDLE_PATH.
 
     Returns:
-        images (dict): The loaded images.
+        images (obj): The image cache.
     """
+    images.colorkey = colorkey
+    use_bundle(BUNDLE_PATH if bundle_path is None else bundle_path)
+    if images.bundle is not None:
+        for name, entry in images.bundle.index.items():
+            images.add(name, os.path.join(directory, entry['file']))
+        return images
     for img in os.listdir(directory):
         name, ext = os.path.splitext(img)
         if ext in extensions:
-            img = pygame.image.load(os.path.join(directory, img))
-            if img.get_alpha():
-                img = img.convert_alpha()
-            else:
-                img = img.convert()
-                img.set_colorkey(colorkey)
-            images[name] = img
+            images.add(name, os.path.join(directory, img))
     return images
 
 
@@ -97,9 +170,45 @@ def load_fonts(directory, extensions=('.ttf')):
     return fonts
 
 
+def scale_image(image, size, quality):
+    """Scales an image to a size.
+
+    Args:
+        image (obj): Surface or delta frame to scale.
+        size (tup): The width and height to scale to.
+        quality (str): 'smooth' for smoothscale, 'fast' for nearest neighbor, or
+            'integer' for nearest neighbor by a whole factor, centered on a white background.
+
+    Returns:
+        scaled (obj): The scaled image.
+    """
+    if isinstance(image, DeltaFrame):
+        image = image.compose()
+    if quality == 'smooth':
+        if image.get_bitsize() == 8:
+            image = image.convert()
+        return pygame.transform.smoothscale(image, size)
+    elif quality == 'fast':
+        return pygame.transform.scale(image, size)
+    elif quality == 'integer':
+        width, height = image.get_size()
+        factor = min(size[0] // width, size[1] // height)
+        if factor < 1:
+            return pygame.transform.scale(image, size)
+        scaled = pygame.transform.scale(image, (width * factor, height * factor))
+        surface = pygame.Surface(size).convert()
+        surface.fill(WHITE)
+        surface.blit(scaled, scaled.get_rect(center=surface.get_rect().center))
+        return surface
+    raise ValueError('Unknown scale quality: ' + str(quality))
+
+
 def render_image(image, screen_size, screen):
     """Renders an image to the screen at the size of the window.
 
+    Each image is scaled once per window size and scale quality. Passing
+    in an image that was scaled for another size scales its source image.
+
     Args:
         image (obj): Image that has been loaded by the game.
         screen_size (tup): The width and height of the screen.
@@ -107,9 +216,305 @@ def render_image(image, screen_size, screen):
     Returns:
         image (obj): Image that has been scaled to the screen size.
     """
-    if image.get_size() != screen_size:
-        image = pygame.transform.smoothscale(image, screen_size, screen)
-    return image
+    if image.get_size() == screen_size:
+        return image
+    source = scaled_sources.get(image)
+    if source is not None and source() is not None:
+        image = source()
+        if image.get_size() == screen_size:
+            return image
+    key = (tuple(screen_size), scale_quality)
+    scaled = scaled_images.setdefault(image, {})
+    if key not in scaled:
+        count_load()
+        scaled[key] = scale_image(image, screen_size, scale_quality)
+        scaled_sources[scaled[key]] = weakref.ref(image)
+    return scaled[key]
+
+
+def clear_scaled_images():
+    """Drops all scaled images, for when the window size changes."""
+    scaled_images.clear()
+
+
+def draw_image(image, screen, area=None):
+    """Draws a full screen image or delta frame to the screen.
+
+    Args:
+        image (obj): Surface or delta frame to draw.
+        screen (obj): Surface to draw on.
+        area (obj): Rect of the image to draw. Draws the whole image if None.
+
+    Returns:
+        rect (obj): The area of the screen that was drawn on.
+    """
+    if isinstance(image, DeltaFrame):
+        return image.draw(screen, area)
+    if area is None:
+        return screen.blit(image, (0, 0))
+    return screen.blit(image, area, area)
+
+
+def shares_base(image, previous):
+    """Checks whether two images are delta frames of the same task.
+
+    Args:
+        image (obj): The image to draw.
+        previous (obj): The image currently on the screen.
+
+    Returns:
+        shared (bool): True if the image can be drawn with DeltaFrame.draw_over.
+    """
+    return (isinstance(image, DeltaFrame) and isinstance(previous, DeltaFrame)
+            and image.base is previous.base)
+
+
+def get_font(font, size):
+    """Gets a font object from the font registry, creating it on first use.
+
+    Args:
+        font (str): Path of the font file.
+        size (int): Size of the font.
+
+    Returns:
+        text_font (obj): The font object for the path and size.
+    """
+    key = (font, size)
+    text_font = font_cache.get(key)
+    if text_font is None:
+        init_module('font')
+        text_font = pygame.font.Font(font, size)
+        font_cache[key] = text_font
+    return text_font
+
+
+def remember(cache, key, value):
+    """Stores a value in a least recently used cache of TEXT_CACHE_SIZE entries.
+
+    Args:
+        cache (obj): The OrderedDict holding the cache, oldest entry first.
+        key (tup): Key of the value.
+        value (obj): The value to store.
+    """
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > TEXT_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def get_text(font, color, text, size):
+    """Gets a rendered text surface from the text cache, rendering it on a miss.
+
+    The cache holds at most TEXT_CACHE_SIZE surfaces and evicts the least recently used one.
+
+    Args:
+        font (str): Name of font.
+        color (tup): RGB color code.
+        text (str): The text to be rendered.
+        size (int): Size of the text.
+
+    Returns:
+        text_surface (obj): The rendered text.
+    """
+    key = (font, size, text, color)
+    text_surface = text_cache.get(key)
+    if text_surface is not None:
+        text_cache.move_to_end(key)
+        text_stats['hits'] += 1
+        return text_surface
+    text_stats['misses'] += 1
+    text_surface = get_font(font, size).render(text, True, color)
+    remember(text_cache, key, text_surface)
+    remember(text_sizes, (font, size, text), text_surface.get_size())
+    return text_surface
+
+
+def get_text_size(font, text, size):
+    """Gets the width and height of rendered text without rendering it.
+
+    The sizes are kept like the text cache, at most TEXT_CACHE_SIZE of them.
+
+    Args:
+        font (str): Name of font.
+        text (str): The text to be measured.
+        size (int): Size of the text.
+
+    Returns:
+        text_size (tup): The width and height of the text.
+    """
+    key = (font, size, text)
+    text_size = text_sizes.get(key)
+    if text_size is not None:
+        text_sizes.move_to_end(key)
+        text_stats['hits'] += 1
+        return text_size
+    text_stats['misses'] += 1
+    text_size = get_font(font, size).size(text)
+    remember(text_sizes, key, text_size)
+    return text_size
+
+
+def text_cache_stats():
+    """Returns the font and text cache counters.
+
+    Returns:
+        stats (dict): Cache hits, misses, and the number of cached fonts and surfaces.
+    """
+    stats = dict(text_stats)
+    stats['fonts'] = len(font_cache)
+    stats['surfaces'] = len(text_cache)
+    return stats
+
+
+def get_glyph_sizes(font, size):
+    """Gets the width and height of each HUD label and glyph, measuring them on first use.
+
+    The sizes don't depend on the color, so one table serves the atlases of
+    every color, and covering HUD text needs no atlas.
+
+    Args:
+        font (str): Name of font.
+        size (int): Size of the text.
+
+    Returns:
+        sizes (dict): Width and height keyed by label or character.
+    """
+    key = (font, size)
+    sizes = glyph_sizes.get(key)
+    if sizes is None:
+        text_font = get_font(font, size)
+        sizes = {piece: text_font.size(piece) for piece in HUD_LABELS + tuple(HUD_GLYPHS)}
+        glyph_sizes[key] = sizes
+    return sizes
+
+
+def get_glyph_atlas(font, color, size):
+    """Gets the HUD glyph atlas for a font, rasterizing it on first use.
+
+    The HUD labels and glyphs are rendered once onto a single sheet,
+    and each one is kept as a subsurface of that sheet.
+
+    Args:
+        font (str): Name of font.
+        color (tup): RGB color code.
+        size (int): Size of the text.
+
+    Returns:
+        glyphs (dict): Glyph subsurfaces keyed by label or character.
+    """
+    key = (font, size, color)
+    glyphs = glyph_atlas.get(key)
+    if glyphs is not None:
+        return glyphs
+    text_font = get_font(font, size)
+    sizes = get_glyph_sizes(font, size)
+    width = sum(piece_width for piece_width, piece_height in sizes.values())
+    height = max(piece_height for piece_width, piece_height in sizes.values())
+    sheet = pygame.Surface((width, height), pygame.SRCALPHA)
+    glyphs = {}
+    x = 0
+    for piece, (piece_width, piece_height) in sizes.items():
+        sheet.blit(text_font.render(piece, True, color), (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+        glyphs[piece] = sheet.subsurface((x, 0, piece_width, height))
+        x += piece_width
+    glyph_atlas[key] = glyphs
+    return glyphs
+
+
+def get_hud_text_rect(font, pieces, size, x, y):
+    """Gets the area of the screen covered by HUD text.
+
+    Args:
+        font (str): Name of font.
+        pieces (list): The atlas keys that make up the text.
+        size (int): Size of the text.
+        x (int): X-axis coordinate of text rectangle.
+        y (int): Y-axis coordinate of text rectangle.
+
+    Returns:
+        text_rect (obj): The area of the text.
+    """
+    sizes = get_glyph_sizes(font, size)
+    width = sum(sizes[piece][0] for piece in pieces)
+    height = max(piece_height for piece_width, piece_height in sizes.values())
+    text_rect = pygame.Rect(0, 0, width, height)
+    text_rect.midtop = (x, y)
+    return text_rect
+
+
+def split_hud_text(text):
+    """Splits HUD text into the labels and characters of the glyph atlas.
+
+    Args:
+        text (str): The text to be split.
+
+    Returns:
+        pieces (list): The atlas keys that make up the text, or None if the text has other characters.
+    """
+    pieces = []
+    i = 0
+    while i < len(text):
+        for label in HUD_LABELS:
+            if text.startswith(label, i):
+                pieces.append(label)
+                i += len(label)
+                break
+        else:
+            if text[i] not in HUD_GLYPHS:
+                return None
+            pieces.append(text[i])
+            i += 1
+    return pieces
+
+
+def render_hud_text(font, color, text, size, x, y, screen):
+    """Draws HUD text to surface by blitting glyphs from the glyph atlas.
+
+    Falls back to render_text if the text has characters outside of the atlas.
+
+    Args:
+        font (str): Name of font.
+        color (tup): RGB color code.
+        text (str): The text to be displayed.
+        size (int): Size of the text.
+        x (int): X-axis coordinate of text rectangle.
+        y (int): Y-axis coordinate of text rectangle.
+        screen (obj): Surface to draw text on.
+
+    Returns:
+        text_rect (obj): The area of the screen that was drawn on.
+    """
+    pieces = split_hud_text(text)
+    if pieces is None:
+        return render_text(font, color, text, size, x, y, screen)
+    glyphs = get_glyph_atlas(font, color, size)
+    text_rect = get_hud_text_rect(font, pieces, size, x, y)
+    glyph_x = text_rect.x
+    for piece in pieces:
+        screen.blit(glyphs[piece], (glyph_x, text_rect.y))
+        glyph_x += glyphs[piece].get_width()
+    return text_rect
+
+
+def clear_hud_text(font, color, text, size, x, y, screen):
+    """Covers HUD text drawn by render_hud_text with solid rectangle to surface.
+
+    Args:
+        font (str): Use same font as the text to be covered.
+        color (tup): RGB color code. Use same color as background.
+        text (str): Use the same text that you are covering.
+        size (int): Use the same size as the rendered text.
+        x (int): Use same X-axis coordinate as the rendered text.
+        y (int): Use same Y-axis coordinate as the rendered text.
+        screen (obj): Surface to draw rectangle on.
+
+    Returns:
+        text_rect (obj): The area of the screen that was covered.
+    """
+    pieces = split_hud_text(text)
+    if pieces is None:
+        return clear_text(font, color, text, size, x, y, screen)
+    return screen.fill(color, get_hud_text_rect(font, pieces, size, x, y))
 
 
 def render_text(font, color, text, size, x, y, screen):
@@ -123,12 +528,14 @@ def render_text(font, color, text, size, x, y, screen):
         x (int): X-axis coordinate of text rectangle.
         y (int): Y-axis coordinate of text rectangle.
         screen (obj): Surface to draw text on.
+
+    Returns:
+        text_rect (obj): The area of the screen that was drawn on.
     """
-    text_font = pygame.font.Font(font, size)
-    text_surface = text_font.render(text, True, color)
+    text_surface = get_text(font, color, text, size)
     text_rect = text_surface.get_rect()
     text_rect.midtop = (x, y)
-    screen.blit(text_surface, text_rect)
+    return screen.blit(text_surface, text_rect)
 
 
 def clear_text(font, color, text, size, x, y, screen):
@@ -142,12 +549,13 @@ def clear_text(font, color, text, size, x, y, screen):
         x (int): Use same X-axis coordinate as the rendered text.
         y (int): Use same Y-axis coordinate as the rendered text.
         screen (obj): Surface to draw rectangle on.
+
+    Returns:
+        text_rect (obj): The area of the screen that was covered.
     """
-    text_font = pygame.font.Font(font, size)
-    text_surface = text_font.render(text, True, color)
-    text_rect = text_surface.get_rect()
+    text_rect = pygame.Rect((0, 0), get_text_size(font, text, size))
     text_rect.midtop = (x, y)
-    screen.fill(color, text_rect)
+    return screen.fill(color, text_rect)
 
 
 def draw_progress_bar(x, y, progress, screen):
@@ -158,6 +566,9 @@ def draw_progress_bar(x, y, progress, screen):
         y (int): Y-axis coordinate to draw the bar.
         progress (int): Completion progress of the task.
         screen (obj): Surface to render bar on.
+
+    Returns:
+        outline_rect (obj): The area of the screen covered by the bar.
     """
     bar_length = 40
     bar_height = 400
@@ -168,6 +579,7 @@ def draw_progress_bar(x, y, progress, screen):
     pygame.draw.rect(screen, GREEN, outline_rect)
     pygame.draw.rect(screen, WHITE, fill_rect)
     pygame.draw.rect(screen, BLACK, outline_rect, 4)
+    return outline_rect
 
 
 def play_music(track):
@@ -176,15 +588,30 @@ def play_music(track):
     Args:
         track (str): Name of the music track to play.
     """
-    pygame.mixer.music.load(track)
-    pygame.mixer.music.play(-1)
+    music.play(track)
 
 
 def play_sound(sound):
-    """Plays a sound once.
+    """Plays a sound once from the sound bank.
 
     Args:
         sound (str): Name of the sound to play.
     """
-    snd = pygame.mixer.Sound(sound)
-    snd.play()
+    sound_bank.play(sound)
+
+
+def percentile(values, percent):
+    """Returns a percentile of a list of numbers by the nearest rank.
+
+    Args:
+        values (list): The numbers. They do not have to be sorted.
+        percent (float): The percentile from 0 to 100.
+
+    Returns:
+        value (float): The percentile, or 0.0 if there are no numbers.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(len(ordered) * percent / 100.0 + 0.5) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
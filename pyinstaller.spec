@@ -2,7 +2,13 @@
 import os
 
 project_path = os.path.dirname(os.path.abspath(SPEC))
-added_data = [('assets', 'assets')]
+# the images ship only as the bundle, which the game reads in place of the image files
+bundle_path = os.path.join('assets', 'images.bundle')
+if not os.path.exists(os.path.join(project_path, bundle_path)):
+    raise SystemExit('Build the image bundle first with python -m data.bundle build')
+added_data = [(os.path.join('assets', 'fonts'), os.path.join('assets', 'fonts')),
+              (os.path.join('assets', 'sounds'), os.path.join('assets', 'sounds')),
+              (bundle_path, 'assets')]
 icon_path = 'assets\\images\\helmet-icon.ico'
 file_name = 'stick-bop'
 app_name = 'stick-bop.app'
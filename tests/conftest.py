@@ -0,0 +1,107 @@
+"""Shared fixtures for the tests.
+
+The game runs headless from the repository root, where the asset
+paths resolve, with fresh asset caches for every test.
+"""
+
+
+import os
+import time
+from collections import OrderedDict
+
+import pygame
+import pytest
+
+from data import audio
+from data import benchmark
+from data import images
+from data import runtime
+from data import state_machine
+from data import states
+from data import tools
+from data.main import setup
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def reset_assets(monkeypatch):
+    """Replaces the asset caches in tools with empty ones.
+
+    Args:
+        monkeypatch (obj): The monkeypatch fixture of the test.
+    """
+    monkeypatch.setattr(tools, 'images', images.ImageCache())
+    monkeypatch.setattr(tools, 'asset_loader', None)
+    monkeypatch.setattr(tools, 'prefetcher', None)
+    monkeypatch.setattr(tools, 'sound_bank', audio.SoundBank())
+    monkeypatch.setattr(tools, 'music', audio.MusicPlayer())
+    monkeypatch.setattr(tools, 'font_cache', {})
+    monkeypatch.setattr(tools, 'text_cache', OrderedDict())
+    monkeypatch.setattr(tools, 'text_sizes', OrderedDict())
+    monkeypatch.setattr(tools, 'glyph_atlas', {})
+    monkeypatch.setattr(tools, 'glyph_sizes', {})
+    monkeypatch.setattr(runtime, 'load_stats', {'foreground': 0})
+    monkeypatch.setattr(state_machine.State, 'score', 0)
+
+
+@pytest.fixture(autouse=True)
+def headless(monkeypatch):
+    """Runs each test from the repository root with fresh asset caches."""
+    monkeypatch.chdir(ROOT)
+    reset_assets(monkeypatch)
+    yield
+    pygame.quit()
+
+
+@pytest.fixture
+def play_game():
+    """Returns play_game, which plays a whole game headless."""
+    return play
+
+
+def play(seed=0, max_frames=100000, wait_prefetch=False, **settings):
+    """Plays a whole game headless on a fixed step clock, finishing every task.
+
+    The menu is started with ENTER, and each task gets one key event per
+    frame from benchmark.synthetic_events, which finishes every task in time.
+
+    Args:
+        seed (int): Seed of the random task order.
+        max_frames (int): Frames to give up after.
+        wait_prefetch (bool): Finishes each prefetch before the next frame, as the wall clock
+            time of the pauses would, since the fixed step clock runs through them in microseconds.
+        **settings: More settings for the state controller. The replay log is saved if record_path is set.
+
+    Returns:
+        game (obj): The state controller, on the win or loss state.
+    """
+    game = setup(headless=True, fast_forward=True, seed=seed, **settings)
+    events = None
+    for frame in range(max_frames):
+        if game.state_name in ('win', 'loss'):
+            break
+        dt = game.clock.tick(0) / 1000.0
+        if game.state_name == 'menu':
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN, mod=0))
+        elif isinstance(game.state, states.Task):
+            if events is None or events[0] is not game.state:
+                events = (game.state, benchmark.synthetic_events(game.state))
+            for event in next(events[1]):
+                pygame.event.post(event)
+        game.event_loop()
+        dirty_rects = game.update(dt)
+        if dirty_rects is None:
+            pygame.display.update()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+        if game.entered is not None:
+            game.record_entry()
+        while game.prefetching is not None:
+            game.step_prefetch()
+            if not wait_prefetch:
+                break
+            time.sleep(0.001)
+    if game.recorder is not None:
+        game.recorder.save(game.record_path)
+    return game
@@ -0,0 +1,42 @@
+"""Tests of the frame-time benchmark."""
+
+
+import json
+import logging
+
+from data import benchmark
+from data import state_machine
+from data import tools
+from data.main import setup
+
+
+def test_start_state_resets_score_music_and_rng():
+    game = setup(headless=True, fast_forward=True, seed=0)
+    state_machine.State.score = 30
+    tools.music.track = 'neon-runner-x125'
+    first = benchmark.start_state(game, 'taskdone').next
+    assert state_machine.State.score == 0
+    assert tools.music.track is None
+    game.rng.random()
+    assert benchmark.start_state(game, 'taskdone').next == first
+
+
+def test_missing_baseline_warns_and_fails(tmp_path, caplog):
+    caplog.set_level(logging.WARNING)
+    argv = ['--frames', '2', '--states', 'taskdone', '--output', str(tmp_path / 'results.json'),
+            '--baseline', str(tmp_path / 'baseline.json')]
+    assert benchmark.main(argv) == 2
+    assert 'No baseline' in caplog.text
+
+
+def test_compare_ignores_growth_under_the_noise_floor():
+    baseline = {'menu': {'p95': 0.001}, 'mining': {'p95': 2.0}}
+    assert benchmark.compare({'menu': {'p95': 0.002}, 'mining': {'p95': 2.3}}, baseline) == []
+    assert benchmark.compare({'menu': {'p95': 0.1}, 'mining': {'p95': 2.5}}, baseline) == ['menu', 'mining']
+
+
+def test_committed_baseline_covers_every_state_but_loading():
+    game = setup(headless=True, fast_forward=True, seed=0)
+    with open(benchmark.BASELINE_PATH) as baseline_file:
+        baseline = json.load(baseline_file)
+    assert set(baseline) == set(game.factories) - {'loading'}
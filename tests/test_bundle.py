@@ -0,0 +1,102 @@
+"""Tests of the image bundle."""
+
+
+import os
+import shutil
+
+import pygame
+import pytest
+
+from data import bundle
+from data import images
+from data import tools
+from data.main import setup
+
+
+MINING_FRAMES = ('mining-1.png', 'mining-2.png')
+# largest difference of a color channel between a palettized pixel and the image file
+MAX_PALETTE_ERROR = 32
+
+
+def build(tmp_path, files=('winner.png', 'game-over.png'), palette=False):
+    setup(headless=True)
+    for img in files:
+        shutil.copy(os.path.join(tools.IMG_DIR, img), str(tmp_path))
+    bundle_path = str(tmp_path / 'images.bundle')
+    bundle.build_bundle(str(tmp_path), bundle_path, palette=palette)
+    return bundle_path
+
+
+def palette_error(np, surface, path):
+    """Returns the largest channel difference of the opaque pixels of a surface from its image file."""
+    screen = pygame.Surface(surface.get_size()).convert()
+    screen.blit(surface, (0, 0))
+    expected = pygame.Surface(surface.get_size()).convert()
+    expected.blit(images.load_image(path), (0, 0))
+    opaque = pygame.surfarray.array_alpha(pygame.image.load(path)) == 255
+    diff = np.abs(pygame.surfarray.array3d(screen).astype(int) - pygame.surfarray.array3d(expected))
+    return diff.max(axis=2)[opaque].max()
+
+
+def test_bundle_is_used_without_the_image_files(tmp_path):
+    bundle_path = build(tmp_path)
+    tools.load_images(str(tmp_path / 'images'), bundle_path=bundle_path)
+    assert tools.images.bundle is not None
+    assert set(tools.images) == {'winner', 'game-over'}
+    assert tools.images['winner'].get_size() == (1000, 800)
+
+
+def test_icon_and_loading_screen_are_read_from_the_bundle(tmp_path, monkeypatch):
+    bundle_path = build(tmp_path, ('helmet-icon.png', 'loading.png'))
+    monkeypatch.setattr(tools, 'IMG_DIR', str(tmp_path / 'images'))
+    monkeypatch.setattr(tools, 'BUNDLE_PATH', bundle_path)
+    tools.change_icon('helmet-icon.png')
+    assert tools.read_image('loading.png').get_size() == (1000, 800)
+
+
+def test_edited_image_is_reported_by_the_check(tmp_path):
+    bundle_path = build(tmp_path)
+    assert bundle.stale_images(str(tmp_path), bundle_path) == []
+    os.utime(str(tmp_path / 'winner.png'), ns=(0, 0))
+    assert bundle.stale_images(str(tmp_path), bundle_path) == []
+    shutil.copy(str(tmp_path / 'game-over.png'), str(tmp_path / 'winner.png'))
+    assert bundle.stale_images(str(tmp_path), bundle_path) == ['winner.png']
+
+
+def test_added_and_removed_images_are_reported_by_the_check(tmp_path):
+    bundle_path = build(tmp_path)
+    shutil.copy(os.path.join(tools.IMG_DIR, 'stick-bop-menu.png'), str(tmp_path))
+    os.remove(str(tmp_path / 'game-over.png'))
+    assert bundle.stale_images(str(tmp_path), bundle_path) == ['game-over.png', 'stick-bop-menu.png']
+
+
+def test_palettized_frames_are_8_bit_within_the_error(tmp_path):
+    np = pytest.importorskip('numpy')
+    bundle_path = build(tmp_path, MINING_FRAMES, palette=True)
+    tools.load_images(str(tmp_path), bundle_path=bundle_path)
+    for img in MINING_FRAMES:
+        name = os.path.splitext(img)[0]
+        surface = tools.images.bundle.surface(name)
+        assert tools.images.bundle.index[name]['format'] == 'P'
+        assert surface.get_bitsize() == 8
+        assert images.surface_bytes(surface) == 1000 * 800
+        assert palette_error(np, surface, str(tmp_path / img)) <= MAX_PALETTE_ERROR
+
+
+def test_palettized_delta_frames_draw_and_scale(tmp_path):
+    np = pytest.importorskip('numpy')
+    bundle_path = build(tmp_path, MINING_FRAMES, palette=True)
+    tools.load_images(str(tmp_path), bundle_path=bundle_path)
+    first, frame = tools.images['mining-1'], tools.images['mining-2']
+    assert frame.base.get_bitsize() == 8
+    assert frame.patches and all(patch.get_bitsize() == 8 for patch, rect in frame.patches)
+    assert images.surface_bytes(frame) < 1000 * 800 / 2
+    screen = pygame.Surface((1000, 800)).convert()
+    first.draw(screen)
+    frame.draw_over(first, screen)
+    path = str(tmp_path / 'mining-2.png')
+    assert palette_error(np, screen, path) <= MAX_PALETTE_ERROR
+    assert palette_error(np, frame.compose(), path) <= MAX_PALETTE_ERROR
+    for quality in tools.SCALE_QUALITIES:
+        assert tools.scale_image(frame, (500, 400), quality).get_size() == (500, 400)
+        assert tools.scale_image(frame, (2000, 1600), quality).get_size() == (2000, 1600)
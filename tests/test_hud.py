@@ -0,0 +1,33 @@
+"""Tests of the text caches and the HUD text drawn from the glyph atlas."""
+
+
+import pygame
+
+from data import tools
+from data.main import setup
+
+
+def test_clearing_hud_text_needs_no_atlas():
+    setup(headless=True)
+    tools.load_fonts(tools.FNT_DIR)
+    font = tools.fonts['OpenSans-Regular']
+    screen = pygame.Surface((400, 100))
+    cleared = tools.clear_hud_text(font, tools.WHITE, 'Timer: 9.5', 40, 200, 0, screen)
+    assert tools.glyph_atlas == {}
+    drawn = tools.render_hud_text(font, tools.BLACK, 'Timer: 9.5', 40, 200, 0, screen)
+    assert cleared == drawn
+    assert list(tools.glyph_atlas) == [(font, 40, tools.BLACK)]
+    assert drawn.size == tools.get_font(font, 40).size('Timer: 9.5')
+
+
+def test_text_sizes_are_kept_in_least_recently_used_order():
+    setup(headless=True)
+    tools.load_fonts(tools.FNT_DIR)
+    font = tools.fonts['OpenSans-Regular']
+    tools.get_text_size(font, 'Final Score: 0', 100)
+    for score in range(tools.TEXT_CACHE_SIZE * 2):
+        tools.get_text(font, tools.BLACK, 'Final Score: ' + str(score), 100)
+        tools.get_text_size(font, 'Final Score: 0', 100)
+    assert len(tools.text_sizes) == tools.TEXT_CACHE_SIZE
+    assert len(tools.text_cache) == tools.TEXT_CACHE_SIZE
+    assert (font, 100, 'Final Score: 0') in tools.text_sizes
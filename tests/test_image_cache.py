@@ -0,0 +1,106 @@
+"""Tests of the image cache."""
+
+
+import threading
+import time
+
+import pygame
+
+from data import images
+from data import runtime
+from data import state_machine
+from data import states
+from data import tasks
+from data import tools
+from data.main import setup
+
+
+def test_full_game_evicts_without_task_misses(monkeypatch, play_game):
+    task_loads = []
+    startup = states.Task.startup
+
+    def count_loads(task):
+        loads = runtime.load_stats['foreground']
+        startup(task)
+        task_loads.append(runtime.load_stats['foreground'] - loads)
+
+    monkeypatch.setattr(states.Task, 'startup', count_loads)
+    game = play_game(seed=0, wait_prefetch=True)
+    assert game.state_name == 'win'
+    assert state_machine.State.score == states.WIN_SCORE
+    assert len(task_loads) == states.WIN_SCORE
+    assert sum(task_loads) == 0
+    stats = tools.images.stats()
+    assert stats['evictions'] > 0
+    assert tools.images.budget == images.IMAGE_BUDGET
+
+
+def test_pinned_frames_are_not_evicted():
+    setup(headless=True)
+    tools.load_images(tools.IMG_DIR)
+    tools.images.budget = 0
+    tools.images.pin(['mining-2', 'mining-3'])
+    for name in ('mining-2', 'mining-3', 'stick-bop-menu', 'winner'):
+        tools.images[name]
+    assert 'mining-2' in tools.images.surfaces
+    assert 'mining-3' in tools.images.surfaces
+    assert 'stick-bop-menu' not in tools.images.surfaces
+    assert 'winner' in tools.images.surfaces
+
+
+def test_bases_are_counted_apart_and_dropped_with_their_frames(monkeypatch):
+    setup(headless=True)
+    tools.load_images(tools.IMG_DIR)
+    tools.images['mining-1']
+    tools.images['mining-2']
+    base = tools.images.bases['mining']
+    assert tools.images.base_bytes == images.surface_bytes(base)
+    assert tools.images.resident_bytes == images.surface_bytes(tools.images['mining-2'])
+
+    reads = []
+    read = tools.images.read
+    monkeypatch.setattr(tools.images, 'read', lambda name: reads.append(name) or read(name))
+    tools.images.discard('mining-1')
+    assert tools.images['mining-1'].base is base
+    assert reads == []
+
+    tools.images.discard('mining-1')
+    tools.images.discard('mining-2')
+    assert tools.images.bases == {}
+    assert tools.images.base_bytes == 0
+    assert tools.images.resident_bytes == 0
+
+
+def test_mining_patches_are_well_under_its_full_frames():
+    setup(headless=True)
+    tools.load_images(tools.IMG_DIR)
+    names = tasks.frame_names(tasks.TASKS['mining'])[1:]
+    patch_bytes = sum(images.surface_bytes(tools.images[name]) for name in names)
+    frame_bytes = sum(images.surface_bytes(tools.images.read(name)) for name in names)
+    assert patch_bytes < frame_bytes / 2
+    for name in names:
+        composed = tools.images[name].compose()
+        assert pygame.image.tobytes(composed, 'RGB') == pygame.image.tobytes(tools.images.read(name), 'RGB'), name
+
+
+def test_prefetch_decodes_frames_off_the_main_thread(monkeypatch):
+    game = setup(headless=True)
+    tools.load_sounds(tools.SND_DIR)
+    tools.load_fonts(tools.FNT_DIR)
+    tools.load_images(tools.IMG_DIR)
+    threads = set()
+    decode = tools.images.decode
+
+    def record_thread(name):
+        threads.add(threading.current_thread().name)
+        return decode(name)
+
+    monkeypatch.setattr(tools.images, 'decode', record_thread)
+    game.prefetch('hammering')
+    deadline = time.perf_counter() + 30
+    while game.prefetching is not None and time.perf_counter() < deadline:
+        game.step_prefetch()
+        time.sleep(0.001)
+    assert game.prefetched == 'hammering'
+    assert threads == {'image-prefetcher'}
+    assert all(name in tools.images.surfaces for name in game.states['hammering'].frame_names)
@@ -0,0 +1,23 @@
+"""Tests of the input-to-display latency measurement."""
+
+
+import time
+
+import pygame
+
+from data.main import setup
+
+
+def test_upper_bound_starts_at_the_previous_poll(tmp_path):
+    game = setup(headless=True, latency_path=str(tmp_path / 'latency.json'))
+    game.event_loop()
+    previous_poll = game.last_poll
+    time.sleep(0.01)
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, mod=0))
+    game.event_loop()
+    assert game.state.event_time == (previous_poll, game.last_poll)
+    assert game.last_poll - previous_poll >= 0.01
+
+    game.latency.record('drilling', game.state.event_time, time.perf_counter())
+    lower, upper = game.latency.samples['drilling'][0]
+    assert upper - lower >= 10.0
@@ -0,0 +1,24 @@
+"""Tests of recording and replaying a game."""
+
+
+from data import state_machine
+from data import states
+from data import tools
+from data.main import setup
+
+from conftest import reset_assets
+
+
+def test_replay_without_rendering_reaches_the_recorded_end(tmp_path, monkeypatch, play_game):
+    log_path = str(tmp_path / 'game.replay')
+    recorded = play_game(seed=3, record_path=log_path)
+    assert recorded.state_name == 'win'
+
+    reset_assets(monkeypatch)
+    game = setup(replay_path=log_path, fast_forward=True, render=False)
+    game.game_loop()
+    assert game.seed == 3
+    assert game.state_name == 'win'
+    assert state_machine.State.score == states.WIN_SCORE
+    assert game.screen.get_size() == state_machine.NO_RENDER_SIZE
+    assert tools.images.stats()['resident_bytes'] < 1024
@@ -0,0 +1,73 @@
+"""Tests of the difficulty simulator."""
+
+
+import pygame
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from data import simulate
+from data import state_machine
+from data import states
+from data import tasks
+
+
+DOWN, UP = pygame.KEYDOWN, pygame.KEYUP
+
+# the shortest key events that finish one task of each pattern
+FASTEST_EVENTS = {
+    # the key is pressed and released 5 times
+    'drilling': [(DOWN, pygame.K_SPACE), (UP, pygame.K_SPACE)] * 5,
+    # right is pressed and released, then left pressed, 5 times; left is released before the next step
+    'mining': ([(DOWN, pygame.K_RIGHT), (UP, pygame.K_RIGHT), (DOWN, pygame.K_LEFT), (UP, pygame.K_LEFT)] * 5)[:-1],
+    # each first key is pressed and released, then the second key pressed; right is released before
+    # the second left -> right step presses it again
+    'excalibur1': [
+        (DOWN, pygame.K_UP), (UP, pygame.K_UP), (DOWN, pygame.K_UP),
+        (DOWN, pygame.K_DOWN), (UP, pygame.K_DOWN), (DOWN, pygame.K_DOWN),
+        (DOWN, pygame.K_LEFT), (UP, pygame.K_LEFT), (DOWN, pygame.K_RIGHT),
+        (UP, pygame.K_RIGHT), (DOWN, pygame.K_LEFT), (UP, pygame.K_LEFT), (DOWN, pygame.K_RIGHT),
+        (DOWN, pygame.K_SPACE), (UP, pygame.K_SPACE), (DOWN, pygame.K_SPACE)
+        ]
+    }
+
+
+def final_count(task, events):
+    """Returns the task count after feeding key events to the compiled table of a task."""
+    table, counts = tasks.compile_task(task)
+    node = 0
+    for event_type, key in events:
+        node = table.get((event_type, key, node), (node, None))[0]
+    return counts[node]
+
+
+@pytest.mark.parametrize('name', sorted(FASTEST_EVENTS))
+def test_task_events_is_the_shortest_finish(name):
+    task = tasks.TASKS[name]
+    events = FASTEST_EVENTS[name]
+    assert final_count(task, events) >= state_machine.TASK_COUNT
+    assert final_count(task, events[:-1]) < state_machine.TASK_COUNT
+    assert simulate.task_events(task) == len(events)
+
+
+def test_patterns_are_all_covered():
+    patterns = {tasks.TASKS[name]['pattern'] for name in FASTEST_EVENTS}
+    assert patterns == {'press_release', 'alternate', 'sequence'}
+
+
+def test_time_limits_match_the_timer_of_each_score_band():
+    limits = simulate.time_limits()
+    rules = state_machine.State()
+    assert len(limits) == states.WIN_SCORE
+    for first, last, timer in ((0, 24, 5), (25, 49, 4.5), (50, 74, 4), (75, 99, 3.5)):
+        assert limits[first] == limits[last] == timer
+        assert rules.timer_check(first) == rules.timer_check(last) == timer
+
+
+def test_seeded_simulation_only_loses_games():
+    reached = simulate.simulate(games=2000, seed=0)
+    assert len(reached) == states.WIN_SCORE + 1
+    assert reached[0] == 2000
+    assert np.all(np.diff(reached) <= 0)
+    assert reached[-1] > 0
+    assert np.array_equal(reached, simulate.simulate(games=2000, seed=0))
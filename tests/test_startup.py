@@ -0,0 +1,96 @@
+"""Tests of the lazy startup and the asset loader."""
+
+
+import threading
+import time
+
+import pygame
+
+from data import audio
+from data import runtime
+from data import tools
+from data.main import parse_args
+from data.main import setup
+
+
+def test_modules_are_not_initialized_off_the_main_thread():
+    setup(headless=True)
+    pygame.mixer.quit()
+    errors = []
+
+    def init():
+        try:
+            runtime.init_module('mixer')
+        except RuntimeError as error:
+            errors.append(error)
+
+    worker = threading.Thread(target=init)
+    worker.start()
+    worker.join()
+    assert errors
+    assert not pygame.mixer.get_init()
+
+
+def test_loading_initializes_the_mixer_on_the_main_thread(monkeypatch):
+    init_threads = []
+    mixer_init = pygame.mixer.init
+
+    def record_init(*args, **kwargs):
+        init_threads.append(threading.current_thread())
+        return mixer_init(*args, **kwargs)
+
+    monkeypatch.setattr(pygame.mixer, 'init', record_init)
+    game = setup(headless=True, fast_forward=True)
+    pygame.mixer.quit()
+    while tools.asset_loader is None or not tools.asset_loader.done:
+        dt = game.clock.tick(0) / 1000.0
+        game.event_loop()
+        game.update(dt)
+    assert tools.asset_loader.error is None
+    assert init_threads == [threading.main_thread()]
+
+
+def test_loader_reads_sounds_without_decoding_them(monkeypatch):
+    sound_threads = []
+    sound = pygame.mixer.Sound
+
+    def record_sound(*args, **kwargs):
+        sound_threads.append(threading.current_thread())
+        return sound(*args, **kwargs)
+
+    monkeypatch.setattr(pygame.mixer, 'Sound', record_sound)
+    game = setup(headless=True, fast_forward=True)
+    while tools.asset_loader is None or not tools.asset_loader.done:
+        dt = game.clock.tick(0) / 1000.0
+        game.event_loop()
+        game.update(dt)
+    effects = [tools.sounds[name] for name in audio.SOUND_EFFECTS]
+    assert sorted(tools.sound_bank.files) == sorted(effects)
+    assert sound_threads == []
+    tools.play_sound(effects[0])
+    assert sound_threads == [threading.main_thread()]
+
+
+def test_menu_prefetches_the_start_sound_and_images():
+    game = setup(headless=True)
+    tools.load_sounds(tools.SND_DIR)
+    tools.load_fonts(tools.FNT_DIR)
+    tools.load_images(tools.IMG_DIR)
+    game.prefetch(game.get_state('menu').next)
+    deadline = time.perf_counter() + 30
+    while game.prefetching is not None and time.perf_counter() < deadline:
+        game.step_prefetch()
+        time.sleep(0.001)
+    assert game.prefetched == 'start'
+    loads = runtime.load_stats['foreground']
+    game.get_state('start').startup()
+    assert runtime.load_stats['foreground'] == loads
+
+
+def test_fullscreen_and_scale_quality_options(monkeypatch):
+    monkeypatch.setattr(tools, 'scale_quality', tools.scale_quality)
+    settings = parse_args(['--headless', '--fullscreen', '--scale-quality', 'integer'])
+    game = setup(**settings)
+    assert game.fullscreen
+    assert tools.scale_quality == 'integer'
+    assert parse_args([])['scale_quality'] == 'smooth'
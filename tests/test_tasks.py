@@ -0,0 +1,203 @@
+"""Tests of the compiled task tables.
+
+The reference classes below restate the event handling of the hand-written
+task states that the tables replaced, with the frame kept as its number.
+Random key events are fed to both, and the frame and count must match
+after every event until the task is finished.
+"""
+
+
+import random
+import time
+
+import pygame
+import pytest
+
+from data import state_machine
+from data import states
+from data import tasks
+from data import tools
+from data.main import setup
+
+
+EVENTS_PER_TASK = 100000
+
+
+class PressRelease:
+    """Drilling and Hammering: the key is pressed and released for each step."""
+
+    def __init__(self, task):
+        self.task = task
+        self.img = 1
+        self.count = 0
+
+    def handle(self, event_type, key):
+        step = int(self.count / self.task['count_per_step'])
+        if event_type == pygame.KEYDOWN and key == self.task['key']:
+            if step < self.task['steps']:
+                self.img = self.task['press'][step]
+        if event_type == pygame.KEYUP and key == self.task['key']:
+            if step < self.task['steps']:
+                self.img = self.task['release'][step]
+            self.count += self.task['count_per_step']
+
+
+class Alternate:
+    """Mining, Flagraising and Tirepumping: the arm key is pressed and released, then the strike key is pressed."""
+
+    def __init__(self, task):
+        self.arm, self.strike = task['keys']
+        self.arm_frames = task['arm']
+        self.strike_frames = task['strike']
+        self.img = 1
+        self.count = 0
+        self.strike_pressed = False
+        self.arm_pressed = False
+        self.arm_was_pressed = False
+
+    def handle(self, event_type, key):
+        if event_type == pygame.KEYDOWN and key == self.strike:
+            self.strike_pressed = True
+            if self.arm_was_pressed and not self.arm_pressed:
+                if self.count < 5:
+                    self.img = self.strike_frames[self.count]
+                self.arm_was_pressed = False
+                self.count += 1
+        elif event_type == pygame.KEYDOWN and key == self.arm:
+            self.arm_pressed = True
+            if not self.arm_was_pressed and not self.strike_pressed:
+                if self.count < 5:
+                    self.img = self.arm_frames[self.count]
+        if event_type == pygame.KEYUP and key == self.strike:
+            self.strike_pressed = False
+        elif event_type == pygame.KEYUP and key == self.arm:
+            if self.arm_pressed:
+                self.arm_pressed = False
+                self.arm_was_pressed = True
+
+
+class Woodchopping(Alternate):
+    """Woodchopping: as Alternate, but every strike shows frame 1 and the last one frame 3."""
+
+    def handle(self, event_type, key):
+        if event_type == pygame.KEYDOWN and key == self.strike:
+            self.strike_pressed = True
+            if self.arm_was_pressed and not self.arm_pressed:
+                self.img = 1
+                self.arm_was_pressed = False
+                if self.count == 4:
+                    self.img = 3
+                self.count += 1
+        elif event_type == pygame.KEYDOWN and key == self.arm:
+            self.arm_pressed = True
+            if not self.arm_was_pressed and not self.strike_pressed:
+                self.img = 2
+        if event_type == pygame.KEYUP and key == self.strike:
+            self.strike_pressed = False
+        elif event_type == pygame.KEYUP and key == self.arm:
+            if self.arm_pressed:
+                self.arm_pressed = False
+                self.arm_was_pressed = True
+
+
+class Excalibur:
+    """Excalibur1-4: Up -> Up, Down -> Down, Left -> Right, Left -> Right, Space -> Space."""
+
+    def __init__(self, task):
+        self.img = 1
+        self.count = 0
+        self.pressed = {key: False for key in (pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE)}
+        self.was_pressed = dict(self.pressed)
+
+    def handle(self, event_type, key):
+        if event_type == pygame.KEYDOWN and key in self.pressed:
+            self.pressed[key] = True
+            if key == pygame.K_UP:
+                self.press_twice(key, 0, 2)
+            elif key == pygame.K_DOWN:
+                self.press_twice(key, 1, 4)
+            elif key == pygame.K_LEFT:
+                if not self.was_pressed[key] and self.count == 2:
+                    self.img = 6
+                elif not self.was_pressed[key] and self.count == 3:
+                    self.img = 8
+            elif key == pygame.K_RIGHT:
+                if self.was_pressed[pygame.K_LEFT] and self.count in (2, 3):
+                    self.img = 7 if self.count == 2 else 9
+                    self.was_pressed[pygame.K_LEFT] = False
+                    self.count += 1
+            elif key == pygame.K_SPACE:
+                self.press_twice(key, 4, 10)
+        if event_type == pygame.KEYUP and key in self.pressed:
+            if self.pressed[key]:
+                counts = {pygame.K_UP: (0,), pygame.K_DOWN: (1,), pygame.K_LEFT: (2, 3),
+                          pygame.K_RIGHT: (2, 3), pygame.K_SPACE: (4,)}[key]
+                if self.count in counts:
+                    self.was_pressed[key] = True
+                self.pressed[key] = False
+
+    def press_twice(self, key, count, frame):
+        if not self.was_pressed[key] and self.count == count:
+            self.img = frame
+        elif self.was_pressed[key] and self.count == count:
+            self.img = frame + 1
+            self.was_pressed[key] = False
+            self.count += 1
+
+
+REFERENCES = {
+    'drilling': PressRelease,
+    'hammering': PressRelease,
+    'mining': Alternate,
+    'flagraising': Alternate,
+    'tirepumping': Alternate,
+    'woodchopping': Woodchopping,
+    'excalibur1': Excalibur,
+    'excalibur2': Excalibur,
+    'excalibur3': Excalibur,
+    'excalibur4': Excalibur
+    }
+
+
+@pytest.mark.parametrize('name', sorted(tasks.TASKS))
+def test_table_matches_hand_written_task(name):
+    task = tasks.TASKS[name]
+    table, counts = tasks.compile_task(task)
+    keys = sorted(tasks.task_keys(task)) + [pygame.K_a]
+    rng = random.Random(name)
+    reference = None
+    for i in range(EVENTS_PER_TASK):
+        if reference is None or reference.count >= state_machine.TASK_COUNT:
+            reference = REFERENCES[name](task)
+            node = 0
+            img = 1
+        event_type = rng.choice((pygame.KEYDOWN, pygame.KEYUP))
+        key = rng.choice(keys)
+        reference.handle(event_type, key)
+        transition = table.get((event_type, key, node))
+        if transition is not None:
+            node, frame = transition
+            if frame is not None:
+                img = frame + 1
+        assert (img, counts[node]) == (reference.img, reference.count), (name, i)
+
+
+class SlowImages:
+    """Image cache stand-in that takes 20 ms to look up each frame."""
+
+    def pin(self, names):
+        pass
+
+    def __getitem__(self, name):
+        time.sleep(0.02)
+        return pygame.Surface((1, 1))
+
+
+def test_task_timer_starts_after_frames_are_looked_up(monkeypatch):
+    setup(headless=True)
+    tools.load_sounds(tools.SND_DIR)
+    monkeypatch.setattr(tools, 'images', SlowImages())
+    task = states.Task('drilling')
+    task.clock = state_machine.Clock()
+    task.startup()
+    assert task.clock.get_ticks() - task.start_time < 20